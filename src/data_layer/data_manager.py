@@ -1,12 +1,136 @@
-import time
-import sys
-import os
+import logging
+import threading
+from queue import Queue, Empty
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 
-# Append current directory to sys.path to ensure imports work correctly
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from src.data_layer.db_utils import execute_query, fetch_query, iter_query, pooled_conn
+from src.data_layer.etl_processor import discover_series_ids, fetch_raw_data, save_many_to_db
 
-from db_utils import fetch_query
-from etl_processor import discover_series_ids, fetch_raw_data, save_to_db
+logger = logging.getLogger(__name__)
+
+# Pipeline settings: how many series are fetched from TMDB in parallel,
+# and how many fetched series are written to the database per transaction
+FETCH_WORKERS = 8
+SAVE_BATCH_SIZE = 100
+
+# Upper bound on submitted-but-unfinished fetches, so IDs can be streamed in lazily
+MAX_IN_FLIGHT = FETCH_WORKERS * 4
+
+# A partial batch is written once no new series arrived for this many seconds
+WRITER_FLUSH_SECONDS = 2.0
+
+# Marks the end of the writer queue
+_STOP = object()
+
+
+def _db_writer(queue, result):
+    """
+    Background writer: drains processed series from the queue and saves them
+    in batches of up to SAVE_BATCH_SIZE over one persistent pooled connection.
+    Runs until it receives _STOP; the number of saved series is stored in result['saved'].
+    """
+    batch = []
+    stopped = False
+
+    def flush():
+        count = save_many_to_db(batch, conn=conn)
+        if count and logger.isEnabledFor(logging.DEBUG):
+            for data in batch:
+                logger.debug("Saved: %s", data['title_en'])
+        result['saved'] += count
+        batch.clear()
+
+    try:
+        with pooled_conn() as conn:
+            while True:
+                try:
+                    item = queue.get(timeout=WRITER_FLUSH_SECONDS)
+                except Empty:
+                    if batch:
+                        flush()
+                    continue
+
+                if item is _STOP:
+                    stopped = True
+                    break
+
+                batch.append(item)
+                if len(batch) >= SAVE_BATCH_SIZE:
+                    flush()
+
+            if batch:
+                flush()
+    except Exception as e:
+        logger.error("Database writer failed: %s", e)
+        # Keep draining so producers never block on a full queue
+        while not stopped:
+            stopped = queue.get() is _STOP
+
+
+def _sync_series(tmdb_ids, progress_every=None, total=None):
+    """
+    Fetches the given series from TMDB and saves them to the database.
+    Fetching runs on FETCH_WORKERS threads; the calling thread only collects
+    results and hands them to a background writer thread (_db_writer), so
+    database writes never block the fetch loop.
+
+    :param tmdb_ids: List (or any iterable, e.g. a streaming cursor) of TMDB IDs to process.
+    :param progress_every: Log a progress line every N processed series (optional).
+    :param total: Number of IDs, for progress output (defaults to len(tmdb_ids)).
+    :return: Number of series saved.
+    """
+    if total is None:
+        total = len(tmdb_ids)
+    processed = 0
+
+    # Bounded, so a slow database applies back-pressure instead of buffering everything
+    queue = Queue(maxsize=SAVE_BATCH_SIZE * 4)
+    result = {'saved': 0}
+    writer = threading.Thread(target=_db_writer, args=(queue, result), name="db-writer", daemon=True)
+    writer.start()
+
+    def collect(future):
+        nonlocal processed
+        if progress_every and processed % progress_every == 0:
+            logger.info("Processing %d/%d...", processed, total)
+        processed += 1
+
+        data = future.result()
+        if data:
+            queue.put(data)
+
+    try:
+        with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as executor:
+            pending = set()
+            for tmdb_id in tmdb_ids:
+                pending.add(executor.submit(fetch_raw_data, tmdb_id))
+                if len(pending) >= MAX_IN_FLIGHT:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        collect(future)
+
+            for future in as_completed(pending):
+                collect(future)
+    finally:
+        queue.put(_STOP)
+        writer.join()
+
+    return result['saved']
+
+
+def refresh_series_features():
+    """
+    Refreshes the series_features materialized view (schema_migrations.sql)
+    so the logic layer sees the synced catalog. Skipped if the view does not exist.
+    """
+    rows = fetch_query("SELECT to_regclass('series_features') IS NOT NULL")
+    if not (rows and rows[0][0]):
+        logger.info("series_features view not found (see schema_migrations.sql). Skipping refresh.")
+        return
+
+    # CONCURRENTLY keeps the view readable by the app while it is rebuilt
+    execute_query("REFRESH MATERIALIZED VIEW CONCURRENTLY series_features")
+    logger.info("Refreshed series_features view.")
 
 
 def update_catalog_by_language(lang_code="en", pages=1):
@@ -17,24 +141,21 @@ def update_catalog_by_language(lang_code="en", pages=1):
     :param lang_code: Language code (e.g., 'es', 'he', 'ko').
     :param pages: Number of pages to scan (20 series per page).
     """
-    print(f"--- Starting Catalog Update (Language: {lang_code}, Pages: {pages}) ---")
+    logger.info("--- Starting Catalog Update (Language: %s, Pages: %s) ---", lang_code, pages)
 
     # 1. Discovery Phase
     new_ids = discover_series_ids(lang_code=lang_code, pages=pages)
-    print(f"Discovered {len(new_ids)} series IDs.")
+    logger.info("Discovered %d series IDs.", len(new_ids))
 
-    count = 0
-    for tmdb_id in new_ids:
-        # 2. ETL Execution Phase
-        # Fetch raw data automatically handles status, country, and TBA logic
-        data = fetch_raw_data(tmdb_id)
-        if data:
-            save_to_db(data)
-            print(f"Saved: {data['title_en']}")
-            count += 1
-        time.sleep(0.1)  # Rate limiting for API
+    # 2. ETL Execution Phase
+    # Fetch raw data automatically handles status, country, and TBA logic
+    count = _sync_series(new_ids)
+
+    # 3. Refresh precomputed features
+    if count:
+        refresh_series_features()
 
-    print(f"--- Finished. Added/Updated {count} series. ---")
+    logger.info("--- Finished. Added/Updated %d series. ---", count)
 
 
 def run_maintenance_repair():
@@ -42,39 +163,37 @@ def run_maintenance_repair():
     Iterates over all existing series in the database and updates them via TMDB.
     Essential for fixing data bugs (e.g., missing countries) and updating series status.
     """
-    print("--- Starting Maintenance Repair Protocol ---")
+    logger.info("--- Starting Maintenance Repair Protocol ---")
 
-    # 1. Fetch all existing IDs from DB
-    query = "SELECT tmdb_id FROM series"
-    rows = fetch_query(query)
+    # 1. Count existing series (the IDs themselves are streamed below)
+    rows = fetch_query("SELECT COUNT(*) FROM series")
+    total = rows[0][0] if rows else 0
 
-    if not rows:
-        print("Database is empty. Nothing to repair.")
+    if not total:
+        logger.info("Database is empty. Nothing to repair.")
         return
 
-    total = len(rows)
-    print(f"Found {total} series in database. Starting update...")
+    logger.info("Found %d series in database. Starting update...", total)
 
-    for i, row in enumerate(rows):
-        # Access by INDEX (0) because fetch_query returns Tuples in your db_utils
-        tmdb_id = row[0]
+    # Access by INDEX (0) because iter_query yields Tuples; a server-side
+    # cursor streams the IDs instead of loading the whole list into memory
+    tmdb_ids = (row[0] for row in iter_query("SELECT tmdb_id FROM series ORDER BY tmdb_id"))
 
-        # Log progress every 10 items to avoid clutter
-        if i % 10 == 0:
-            print(f"Processing {i}/{total}...")
+    # 2. Re-fetch and Save
+    # This forces the ETL to re-process and apply all current logic fixes
+    # Log progress every 10 items to avoid clutter
+    _sync_series(tmdb_ids, progress_every=10, total=total)
 
-        # 2. Re-fetch and Save
-        # This forces the ETL to re-process and apply all current logic fixes
-        data = fetch_raw_data(tmdb_id)
-        if data:
-            save_to_db(data)
-
-        time.sleep(0.1)
+    # 3. Refresh precomputed features
+    refresh_series_features()
 
-    print("--- Maintenance Complete. All series are up to date. ---")
+    logger.info("--- Maintenance Complete. All series are up to date. ---")
 
 
 if __name__ == "__main__":
+    # INFO shows progress and summaries; use logging.DEBUG to list every saved title
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
     # Usage Examples:
 
     # 1. Expand Catalog (e.g., add top Spanish series):
@@ -1,26 +1,139 @@
 import psycopg2
+import psycopg2.extensions
 from psycopg2.extras import RealDictCursor
+from psycopg2.pool import ThreadedConnectionPool
+import io
 import os
+import threading
+from contextlib import contextmanager
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Connection pool bounds. psycopg2's pool keeps at most POOL_MIN_CONN idle
+# connections: extra ones (opened under load, up to POOL_MAX_CONN) are closed
+# when returned, so POOL_MIN_CONN is the number reused across queries/requests
+POOL_MIN_CONN = 4
+POOL_MAX_CONN = 32
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class PreparedConnection(psycopg2.extensions.connection):
+    """
+    Connection that remembers which named statements were PREPAREd on it.
+    Prepared statements live for the whole database session, so a pooled
+    connection keeps them across transactions (see execute_prepared()).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+
+
+def _connection_params():
+    """
+    Connection keyword arguments built from the DB_* environment variables.
+    """
+    return {
+        'host': os.getenv('DB_HOST'),
+        'database': os.getenv('DB_NAME'),
+        'user': os.getenv('DB_USER'),
+        'password': os.getenv('DB_PASS'),
+        'port': 5432
+    }
+
 
 def get_connection():
     """
     Establishes a connection to the PostgreSQL database using environment variables.
     Requires DB_HOST, DB_NAME, DB_USER, and DB_PASS to be set in the .env file.
+
+    Note: This opens a dedicated (non-pooled) connection that the caller must close.
+          Prefer pooled_conn() for regular queries.
+    """
+    return psycopg2.connect(**_connection_params())
+
+
+def _get_pool():
+    """
+    Returns the module-level connection pool, creating it on first use.
+    Created lazily so importing this module never requires a reachable database.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadedConnectionPool(
+                    POOL_MIN_CONN, POOL_MAX_CONN,
+                    connection_factory=PreparedConnection,
+                    **_connection_params()
+                )
+    return _pool
+
+
+def warm_up_pool():
+    """
+    Creates the connection pool now (opening its POOL_MIN_CONN connections), so
+    the first requests of a server reuse warm connections instead of paying the
+    connect/auth round trips. Failures are reported, not raised: the pool is
+    then created on first use as usual.
+
+    :return: True if the pool is ready.
+    """
+    try:
+        _get_pool()
+        return True
+    except Exception as e:
+        print(f"Connection pool warm-up failed: {e}")
+        return False
+
+
+@contextmanager
+def pooled_conn():
     """
-    return psycopg2.connect(
-        host=os.getenv('DB_HOST'),
-        database=os.getenv('DB_NAME'),
-        user=os.getenv('DB_USER'),
-        password=os.getenv('DB_PASS'),
-        port=5432
-    )
+    Borrows a connection from the pool and returns it when the block exits.
+    Any transaction left open is rolled back by the pool on return.
+    """
+    pool = _get_pool()
+    conn = pool.getconn()
+    try:
+        yield conn
+    finally:
+        pool.putconn(conn)
 
 
-def execute_query(query, params=None, fetch=False):
+@contextmanager
+def db_transaction(conn=None):
+    """
+    Borrows a single pooled connection and runs everything inside the block as one transaction.
+    Commits on success, rolls back (and re-raises) on error, and always returns the connection.
+
+    :param conn: Optional connection the caller already holds (e.g., a long-lived
+                 writer's pooled_conn()); the transaction then runs on it and the
+                 connection is left open.
+
+    Usage:
+        with db_transaction() as conn:
+            execute_query(query_a, params_a, conn=conn)
+            copy_upsert(table, columns, rows, on_conflict, conn=conn)
+    """
+    if conn is None:
+        with pooled_conn() as conn:
+            with db_transaction(conn) as conn:
+                yield conn
+        return
+
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def execute_query(query, params=None, fetch=False, conn=None):
     """
     Executes a modification query (INSERT, UPDATE, DELETE).
 
@@ -28,20 +141,126 @@ def execute_query(query, params=None, fetch=False):
     :param params: Tuple of parameters to prevent SQL injection.
     :param fetch: Boolean, whether to fetch results. Defaults to False.
                   Set to True only if using a RETURNING clause.
+    :param conn: Optional open connection (e.g., from db_transaction()).
+                 When given, the query joins the caller's transaction: it is not
+                 committed here, the connection is left open, and errors propagate.
     :return: A list of RealDictRow (dictionaries) if fetch=True, otherwise None.
     """
-    conn = get_connection()
-    try:
+    if conn is not None:
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
             cur.execute(query, params)
-            result = cur.fetchall() if fetch else None
-            conn.commit()
-            return result
+            return cur.fetchall() if fetch else None
+
+    try:
+        with pooled_conn() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(query, params)
+                result = cur.fetchall() if fetch else None
+                conn.commit()
+                return result
     except Exception as e:
         print(f"Database error: {e}")
         return None
-    finally:
-        conn.close()
+
+
+def execute_prepared(name, query, params, conn, fetch=False):
+    """
+    Runs a statement through a server-side prepared statement.
+
+    The first call on a connection sends PREPARE (parse + plan once); every
+    later call only sends EXECUTE with the parameters, skipping SQL parsing.
+
+    :param name: Statement name (unique per query text).
+    :param query: The SQL using $1, $2, ... placeholders.
+    :param params: Tuple of parameters, in placeholder order.
+    :param conn: Open connection from the pool (e.g., from db_transaction()).
+                 Like execute_query(conn=...), nothing is committed and errors propagate.
+    :param fetch: Boolean, whether to fetch results (as Tuples, like fetch_query).
+    :return: A list of Tuples if fetch=True, otherwise None.
+    """
+    prepared = getattr(conn, 'prepared', None)
+
+    with conn.cursor() as cur:
+        if prepared is None or name not in prepared:
+            cur.execute(f"PREPARE {name} AS {query}")
+            if prepared is not None:
+                prepared.add(name)
+
+        placeholders = ", ".join(["%s"] * len(params))
+        cur.execute(f"EXECUTE {name} ({placeholders})", params)
+        result = cur.fetchall() if fetch else None
+
+        if prepared is None:
+            # Plain connection: nothing tracks the statement, so don't leave it behind
+            cur.execute(f"DEALLOCATE {name}")
+
+        return result
+
+
+def fetch_prepared(name, query, params):
+    """
+    Read-only counterpart of fetch_query() for hot, repeated queries: runs
+    through a server-side prepared statement on a pooled connection, so the
+    SQL is parsed and planned once per connection (see execute_prepared()).
+
+    :param name: Statement name (unique per query text).
+    :param query: The SQL using $1, $2, ... placeholders.
+    :param params: Tuple of parameters, in placeholder order.
+    :return: A list of Tuples (access data by index, e.g., row[0]).
+    """
+    try:
+        with pooled_conn() as conn:
+            return execute_prepared(name, query, params, conn, fetch=True)
+    except Exception as e:
+        print(f"Error fetching data: {e}")
+        return []
+
+
+def _csv_field(value):
+    """
+    Formats one value for COPY ... WITH (FORMAT csv).
+    None stays an unquoted empty field (NULL); everything else is quoted,
+    so empty strings and embedded commas/quotes/newlines survive intact.
+    """
+    if value is None:
+        return ''
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def copy_upsert(table, columns, rows, on_conflict, conn=None):
+    """
+    Bulk-loads rows into a table through a temporary staging table and COPY.
+
+    The rows are streamed with COPY FROM STDIN (no per-row parameter parsing),
+    then moved into the target with a single INSERT ... SELECT that applies
+    the given ON CONFLICT clause. Much faster than INSERTs for large loads.
+
+    :param table: Target table name.
+    :param columns: List of column names, in the same order as each row tuple.
+    :param rows: List of tuples.
+    :param on_conflict: The ON CONFLICT clause, e.g. "ON CONFLICT (genre_id) DO NOTHING".
+    :param conn: Optional open connection (see execute_query).
+    """
+    if not rows:
+        return
+
+    if conn is None:
+        try:
+            with db_transaction() as conn:
+                copy_upsert(table, columns, rows, on_conflict, conn=conn)
+        except Exception as e:
+            print(f"Database error: {e}")
+        return
+
+    stage = f"{table}_stage"
+    column_list = ", ".join(columns)
+    buffer = io.StringIO("\n".join(",".join(_csv_field(v) for v in row) for row in rows))
+
+    with conn.cursor() as cur:
+        cur.execute(f"CREATE TEMP TABLE {stage} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP")
+        cur.copy_expert(f"COPY {stage} ({column_list}) FROM STDIN WITH (FORMAT csv)", buffer)
+        cur.execute(f"INSERT INTO {table} ({column_list}) SELECT {column_list} FROM {stage} {on_conflict}")
+        cur.execute(f"DROP TABLE {stage}")
 
 
 def fetch_query(query, params=None):
@@ -53,20 +272,82 @@ def fetch_query(query, params=None):
     :return: A list of Tuples (access data by index, e.g., row[0]).
              Note: This function uses a standard cursor, NOT a dictionary cursor.
     """
-    conn = None
     try:
-        conn = get_connection()
-        cur = conn.cursor()
-        cur.execute(query, params)
-        results = cur.fetchall()
-        cur.close()
-        return results
+        with pooled_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, params)
+                return cur.fetchall()
     except Exception as e:
         print(f"Error fetching data: {e}")
         return []
-    finally:
-        if conn:
-            conn.close()
+
+
+def fetch_dicts(query, params=None):
+    """
+    Same as fetch_query(), but rows come back as dictionaries keyed by column
+    name (RealDictCursor builds them from the column metadata), ready to be
+    returned as JSON without a per-row conversion loop.
+
+    :param query: The SQL query string (alias computed columns with AS).
+    :param params: Tuple of parameters.
+    :return: A list of RealDictRow (dictionaries).
+    """
+    try:
+        with pooled_conn() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(query, params)
+                return cur.fetchall()
+    except Exception as e:
+        print(f"Error fetching data: {e}")
+        return []
+
+
+def fetch_with_id_table(query, ids):
+    """
+    Executes a read-only query over a long list of IDs. The IDs are not sent
+    as parameters: they are streamed with COPY into a temporary table
+    `_tmp_ids (tmdb_id)` that the query joins (e.g. JOIN _tmp_ids USING (tmdb_id)),
+    so nothing is parsed per ID and the planner can hash-join.
+    The table is dropped when the transaction ends.
+
+    :param query: The SQL query string, joining _tmp_ids.
+    :param ids: List of IDs (duplicates are ignored).
+    :return: A list of Tuples (access data by index, e.g., row[0]).
+    """
+    buffer = io.StringIO("\n".join(str(int(i)) for i in dict.fromkeys(ids)))
+    try:
+        with db_transaction() as conn:
+            with conn.cursor() as cur:
+                cur.execute("CREATE TEMP TABLE _tmp_ids (tmdb_id bigint PRIMARY KEY) ON COMMIT DROP")
+                cur.copy_expert("COPY _tmp_ids (tmdb_id) FROM STDIN", buffer)
+                cur.execute(query)
+                return cur.fetchall()
+    except Exception as e:
+        print(f"Error fetching data: {e}")
+        return []
+
+
+def iter_query(query, params=None, itersize=1000):
+    """
+    Executes a read-only query through a server-side (named) cursor and yields rows one by one.
+    Rows are streamed from PostgreSQL in chunks of `itersize`, so memory stays constant
+    no matter how large the result set is.
+
+    :param query: The SQL query string.
+    :param params: Tuple of parameters.
+    :param itersize: Number of rows fetched per network round trip.
+    :return: Generator of Tuples (access data by index, e.g., row[0]).
+    """
+    with pooled_conn() as conn:
+        try:
+            with conn.cursor(name='iter_query_cursor') as cur:
+                cur.itersize = itersize
+                cur.execute(query, params)
+                for row in cur:
+                    yield row
+        finally:
+            # Named cursors live inside a transaction; end it before the connection goes back
+            conn.rollback()
 
 
 def test_connection():
@@ -1,17 +1,18 @@
 import requests
 import os
-import sys
-
-# Add parent directory to path
-current_dir = os.path.dirname(os.path.abspath(__file__))
-sys.path.insert(0, current_dir)
+import orjson
+import time
+import hashlib
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from dotenv import load_dotenv
 
-try:
-    from .db_utils import execute_query
-except ImportError:
-    from db_utils import execute_query
+from src.data_layer.db_utils import execute_query, copy_upsert, db_transaction
 
-from dotenv import load_dotenv
+current_dir = os.path.dirname(os.path.abspath(__file__))
 
 load_dotenv()
 TMDB_TOKEN = os.getenv('TMDB_TOKEN')
@@ -20,6 +21,193 @@ HEADERS = {
     "accept": "application/json"
 }
 
+# Shared worker pool for concurrent TMDB requests (the calls are I/O bound)
+HTTP_MAX_WORKERS = 16
+_HTTP_POOL = ThreadPoolExecutor(max_workers=HTTP_MAX_WORKERS, thread_name_prefix="tmdb")
+
+# Retry policy for TMDB rate limiting (HTTP 429) and transient server errors
+MAX_RETRIES = 5
+BACKOFF_FACTOR = 0.2
+RETRY_STATUS_CODES = [429, 500, 502, 503, 504]
+
+# Persistent session: keep-alive connections to api.themoviedb.org are reused
+# across requests instead of paying a TCP + TLS handshake on every call.
+# Retry honors Retry-After and backs off exponentially between attempts.
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=32,
+    max_retries=Retry(
+        total=MAX_RETRIES,
+        backoff_factor=BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUS_CODES,
+        raise_on_status=False
+    )
+))
+
+# On-disk cache of TMDB responses, so repeated runs skip unchanged data.
+# Entries older than their TTL are revalidated with ETag / Last-Modified.
+TMDB_CACHE_DIR = os.getenv('TMDB_CACHE_DIR', os.path.join(current_dir, 'tmdb_cache'))
+
+# The series response bundles watch providers, which change often, so it
+# gets the providers' shorter TTL (revalidation keeps unchanged data cheap)
+CACHE_TTL_SERIES = 60 * 60
+
+# Sub-resources bundled into the single series details request
+SERIES_APPEND_TO_RESPONSE = "keywords,watch/providers,content_ratings,translations"
+
+# Client-side request budget (TMDB currently allows ~50 requests/second per IP)
+TMDB_MAX_REQUESTS = 40
+TMDB_WINDOW_SECONDS = 1.0
+
+
+class TmdbRateLimiter:
+    """
+    Thread-safe sliding-window rate limiter for TMDB requests.
+
+    Callers only wait when the local budget (max_requests per window) is spent,
+    or when TMDB itself signals exhaustion through its response headers
+    (Retry-After, or X-RateLimit-Remaining reaching 0 until X-RateLimit-Reset).
+    """
+
+    def __init__(self, max_requests=TMDB_MAX_REQUESTS, window_seconds=TMDB_WINDOW_SECONDS):
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+        self._timestamps = deque()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Blocks until a request may be sent, then records it.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._timestamps and now - self._timestamps[0] >= self.window_seconds:
+                    self._timestamps.popleft()
+
+                if now < self._blocked_until:
+                    wait = self._blocked_until - now
+                elif len(self._timestamps) < self.max_requests:
+                    self._timestamps.append(now)
+                    return
+                else:
+                    wait = self._timestamps[0] + self.window_seconds - now
+
+            time.sleep(wait)
+
+    def update(self, response):
+        """
+        Reads TMDB rate-limit headers from a response and pauses all callers if needed.
+        """
+        headers = response.headers
+        pause = 0.0
+
+        retry_after = headers.get('Retry-After')
+        if retry_after:
+            try:
+                pause = float(retry_after)
+            except ValueError:
+                pass
+        elif headers.get('X-RateLimit-Remaining') == '0' and headers.get('X-RateLimit-Reset'):
+            try:
+                pause = float(headers['X-RateLimit-Reset']) - time.time()
+            except ValueError:
+                pass
+
+        if pause > 0:
+            with self._lock:
+                self._blocked_until = max(self._blocked_until, time.monotonic() + pause)
+
+
+# Shared by every TMDB call in this module
+RATE_LIMITER = TmdbRateLimiter()
+
+
+def _tmdb_get(url, params=None, extra_headers=None):
+    """
+    Performs a rate-limited GET request against TMDB through SESSION.
+    429 / 5xx answers are retried by the session's Retry policy; the final
+    response's rate-limit headers are fed back into RATE_LIMITER.
+    """
+    RATE_LIMITER.acquire()
+    response = SESSION.get(url, headers=extra_headers, params=params)
+    RATE_LIMITER.update(response)
+    return response
+
+
+def _cache_path(url, params):
+    """
+    Cache file location for a request, keyed by URL and query parameters.
+    """
+    key = url.encode('utf-8') + orjson.dumps(params or {}, option=orjson.OPT_SORT_KEYS)
+    return os.path.join(TMDB_CACHE_DIR, hashlib.sha1(key).hexdigest() + '.json')
+
+
+def _read_cache(path):
+    try:
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def _write_cache(path, entry):
+    # Write to a temp file first so concurrent readers never see a partial file
+    try:
+        os.makedirs(TMDB_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(orjson.dumps(entry))
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Cache write failed for {path}: {e}")
+
+
+def _get_json(url, params=None, ttl=None):
+    """
+    Performs a rate-limited GET request against TMDB and returns the decoded JSON body.
+
+    :param ttl: Seconds a cached response stays fresh. None disables the cache.
+                Stale entries are revalidated with If-None-Match / If-Modified-Since,
+                so an unchanged resource costs a cheap 304 instead of a full download.
+    """
+    if ttl is None:
+        return orjson.loads(_tmdb_get(url, params=params).content)
+
+    path = _cache_path(url, params)
+    entry = _read_cache(path)
+    now = time.time()
+
+    if entry and now - entry['fetched_at'] < ttl:
+        return entry['body']
+
+    validators = {}
+    if entry and entry.get('etag'):
+        validators['If-None-Match'] = entry['etag']
+    if entry and entry.get('last_modified'):
+        validators['If-Modified-Since'] = entry['last_modified']
+
+    response = _tmdb_get(url, params=params, extra_headers=validators)
+
+    if response.status_code == 304 and entry:
+        entry['fetched_at'] = now
+        _write_cache(path, entry)
+        return entry['body']
+
+    body = orjson.loads(response.content)
+    if response.status_code == 200:
+        _write_cache(path, {
+            'fetched_at': now,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'body': body
+        })
+
+    return body
+
 
 def discover_series_ids(lang_code="en", sort_by="popularity.desc", pages=1):
     """
@@ -30,10 +218,9 @@ def discover_series_ids(lang_code="en", sort_by="popularity.desc", pages=1):
     :param pages: Number of pages to fetch (20 items per page).
     :return: A list of integer TMDB IDs.
     """
-    all_ids = []
     base_url = "https://api.themoviedb.org/3/discover/tv"
 
-    for page in range(1, pages + 1):
+    def fetch_page(page):
         params = {
             "language": "he-IL",
             "sort_by": sort_by,
@@ -41,12 +228,18 @@ def discover_series_ids(lang_code="en", sort_by="popularity.desc", pages=1):
             "with_original_language": lang_code
         }
         try:
-            response = requests.get(base_url, headers=HEADERS, params=params)
+            response = _tmdb_get(base_url, params=params)
             if response.status_code == 200:
-                results = response.json().get("results", [])
-                all_ids.extend([s["id"] for s in results])
+                results = orjson.loads(response.content).get("results", [])
+                return [s["id"] for s in results]
         except Exception as e:
             print(f"Error discovering page {page}: {e}")
+        return []
+
+    # Pages are independent, so they are fetched concurrently (map keeps page order)
+    all_ids = []
+    for page_ids in _HTTP_POOL.map(fetch_page, range(1, pages + 1)):
+        all_ids.extend(page_ids)
 
     return all_ids
 
@@ -55,49 +248,50 @@ def clean_date(date_str):
     """
     Helper function to convert empty date strings to None (NULL in SQL).
     """
-    if not date_str or date_str.strip() == "":
-        return None
-    return date_str
+    return (date_str or '').strip() or None
+
+
+def _english_translation(data):
+    """
+    Returns the English title/overview entry from an appended 'translations' block
+    (preferring en-US), or an empty dict if there is none.
+    """
+    english = {}
+    for t in data.get('translations', {}).get('translations', []):
+        if t.get('iso_639_1') == 'en':
+            english = t.get('data') or {}
+            if t.get('iso_3166_1') == 'US':
+                break
+    return english
 
 
 def fetch_raw_data(tmdb_id):
     """
     Fetches comprehensive data for a single series from TMDB.
-    Aggregates data from multiple endpoints: Details (HE/EN), Keywords, Providers, and Content Ratings.
+    A single details request (Hebrew) carries Keywords, Providers, Content Ratings
+    and Translations (English fallback) through append_to_response.
     Applies logic for Status normalization, Country fixing, and TBA providers.
 
     :param tmdb_id: The TMDB ID of the series.
     :return: A dictionary containing processed series data, or None if failed.
     """
     try:
-        # 1. Fetch basic info in Hebrew
-        url_he = f"https://api.themoviedb.org/3/tv/{tmdb_id}?language=he-IL"
-        data_he = requests.get(url_he, headers=HEADERS).json()
-
-        # 2. Fetch basic info in English (fallback for titles/overview)
-        url_en = f"https://api.themoviedb.org/3/tv/{tmdb_id}?language=en-US"
-        data_en = requests.get(url_en, headers=HEADERS).json()
-
-        # 3. Fetch Keywords
-        url_keywords = f"https://api.themoviedb.org/3/tv/{tmdb_id}/keywords"
-        keywords_data = requests.get(url_keywords, headers=HEADERS).json()
-
-        # 4. Fetch Watch Providers
-        url_providers = f"https://api.themoviedb.org/3/tv/{tmdb_id}/watch/providers"
-        providers_data = requests.get(url_providers, headers=HEADERS).json()
+        data_he = _get_json(
+            f"https://api.themoviedb.org/3/tv/{tmdb_id}",
+            params={"language": "he-IL", "append_to_response": SERIES_APPEND_TO_RESPONSE},
+            ttl=CACHE_TTL_SERIES
+        )
+        keywords_data = data_he.get('keywords', {})
+        providers_data = data_he.get('watch/providers', {})
+        ratings_data = data_he.get('content_ratings', {})
 
-        # 5. Fetch Content Ratings
-        ratings_url = f"https://api.themoviedb.org/3/tv/{tmdb_id}/content_ratings"
-        ratings_data = requests.get(ratings_url, headers=HEADERS).json()
+        # English title/overview (the en-US details endpoint falls back to the original name)
+        data_en = _english_translation(data_he)
+        title_en = data_en.get('name') or data_he.get('original_name')
 
         # Extract Content Rating (Prefer 'IL', fallback to 'US')
-        content_rating = "NR"
-        for r in ratings_data.get('results', []):
-            if r['iso_3166_1'] == 'IL':
-                content_rating = r['rating']
-                break
-            elif r['iso_3166_1'] == 'US' and content_rating == "NR":
-                content_rating = r['rating']
+        by_country = {r['iso_3166_1']: r['rating'] for r in ratings_data.get('results', [])}
+        content_rating = by_country.get('IL') or by_country.get('US') or "NR"
 
         # --- Status Normalization Logic ---
         raw_status = data_he.get('status')
@@ -133,7 +327,7 @@ def fetch_raw_data(tmdb_id):
         return {
             'tmdb_id': tmdb_id,
             'title_he': data_he.get('name'),
-            'title_en': data_en.get('name'),
+            'title_en': title_en,
             'overview': data_he.get('overview') or data_en.get('overview'),
             'popularity': data_he.get('popularity'),
             'poster_path': data_he.get('poster_path'),
@@ -156,21 +350,51 @@ def fetch_raw_data(tmdb_id):
         return None
 
 
-def save_to_db(data):
+def save_many_to_db(rows, conn=None):
     """
-    Saves the processed data to the database using Upsert logic.
-    Handles Series, Genres, Keywords, and Providers tables.
+    Saves a batch of processed series in one transaction.
+    Every table is bulk-loaded with COPY for the whole batch.
+
+    :param rows: List of dictionaries as returned by fetch_raw_data().
+    :param conn: Optional connection to reuse (the batch is still committed on its own).
+    :return: Number of series saved (0 if the transaction failed).
     """
-    if not data:
-        return
+    # A multi-row upsert may not touch the same key twice - keep the latest copy
+    rows = list({data['tmdb_id']: data for data in rows if data}.values())
+    if not rows:
+        return 0
+
+    try:
+        with db_transaction(conn) as conn:
+            _write_series_batch(rows, conn)
+    except Exception as e:
+        print(f"Database error saving batch of {len(rows)} series: {e}")
+        return 0
+
+    return len(rows)
+
+
+def _write_series_batch(rows, conn):
+    """
+    Writes a batch of processed series (and their relations) using the given connection.
+    Every table is bulk-loaded with COPY through a staging table (see copy_upsert).
+    Does not commit - the caller owns the transaction.
+    """
+    series_ids = [data['tmdb_id'] for data in rows]
 
     # 1. Series Table (Upsert)
-    query_series = """
-        INSERT INTO series (
-            tmdb_id, title_he, title_en, overview, popularity, poster_path,
-            original_language, origin_country, status, adult,
-            first_air_date, last_air_date, number_of_seasons, number_of_episodes, content_rating
-        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    copy_upsert(
+        'series',
+        ['tmdb_id', 'title_he', 'title_en', 'overview', 'popularity', 'poster_path',
+         'original_language', 'origin_country', 'status', 'adult',
+         'first_air_date', 'last_air_date', 'number_of_seasons', 'number_of_episodes', 'content_rating'],
+        [(
+            data['tmdb_id'], data['title_he'], data['title_en'], data['overview'], data['popularity'],
+            data['poster_path'], data['original_language'], data['origin_country'], data['status'],
+            data['adult'], data['first_air_date'], data['last_air_date'],
+            data['number_of_seasons'], data['number_of_episodes'], data['content_rating']
+        ) for data in rows],
+        """
         ON CONFLICT (tmdb_id) DO UPDATE SET
             title_he = EXCLUDED.title_he,
             title_en = EXCLUDED.title_en,
@@ -181,48 +405,35 @@ def save_to_db(data):
             origin_country = EXCLUDED.origin_country,
             number_of_seasons = EXCLUDED.number_of_seasons,
             number_of_episodes = EXCLUDED.number_of_episodes,
-            content_rating = EXCLUDED.content_rating;
-    """
-    execute_query(query_series, (
-        data['tmdb_id'], data['title_he'], data['title_en'], data['overview'], data['popularity'],
-        data['poster_path'], data['original_language'], data['origin_country'], data['status'],
-        data['adult'], data['first_air_date'], data['last_air_date'],
-        data['number_of_seasons'], data['number_of_episodes'], data['content_rating']
-    ), fetch=False)
+            content_rating = EXCLUDED.content_rating
+        """,
+        conn=conn
+    )
 
     # 2. Genres
-    for genre in data['genres']:
-        execute_query(
-            "INSERT INTO genres (genre_id, genre_name, main_category) VALUES (%s, %s, %s) ON CONFLICT (genre_id) DO NOTHING",
-            (genre['id'], genre['name'], genre['name']), fetch=False
-        )
-        execute_query(
-            "INSERT INTO series_genres (tmdb_id, genre_id) VALUES (%s, %s) ON CONFLICT DO NOTHING",
-            (data['tmdb_id'], genre['id']), fetch=False
-        )
+    copy_upsert('genres', ['genre_id', 'genre_name', 'main_category'],
+                [(g['id'], g['name'], g['name']) for data in rows for g in data['genres']],
+                "ON CONFLICT (genre_id) DO NOTHING", conn=conn)
+    copy_upsert('series_genres', ['tmdb_id', 'genre_id'],
+                [(data['tmdb_id'], g['id']) for data in rows for g in data['genres']],
+                "ON CONFLICT DO NOTHING", conn=conn)
 
     # 3. Keywords
-    for kw in data['keywords']:
-        execute_query(
-            "INSERT INTO keywords (keyword_id, name) VALUES (%s, %s) ON CONFLICT (keyword_id) DO NOTHING",
-            (kw['id'], kw['name']), fetch=False
-        )
-        execute_query(
-            "INSERT INTO series_keywords (tmdb_id, keyword_id) VALUES (%s, %s) ON CONFLICT DO NOTHING",
-            (data['tmdb_id'], kw['id']), fetch=False
-        )
+    copy_upsert('keywords', ['keyword_id', 'name'],
+                [(kw['id'], kw['name']) for data in rows for kw in data['keywords']],
+                "ON CONFLICT (keyword_id) DO NOTHING", conn=conn)
+    copy_upsert('series_keywords', ['tmdb_id', 'keyword_id'],
+                [(data['tmdb_id'], kw['id']) for data in rows for kw in data['keywords']],
+                "ON CONFLICT DO NOTHING", conn=conn)
 
     # 4. Providers
     # Clean old availability for IL before inserting new data
-    execute_query("DELETE FROM series_availability WHERE tmdb_id = %s AND country_code = 'IL'", (data['tmdb_id'],),
-                  fetch=False)
-
-    for prov in data['providers']:
-        execute_query(
-            "INSERT INTO streaming_providers (provider_id, provider_name, logo_path) VALUES (%s, %s, %s) ON CONFLICT (provider_id) DO NOTHING",
-            (prov['provider_id'], prov['provider_name'], prov['logo_path']), fetch=False
-        )
-        execute_query(
-            "INSERT INTO series_availability (tmdb_id, provider_id, country_code) VALUES (%s, %s, 'IL') ON CONFLICT DO NOTHING",
-            (data['tmdb_id'], prov['provider_id']), fetch=False
-        )
+    execute_query("DELETE FROM series_availability WHERE tmdb_id = ANY(%s) AND country_code = 'IL'",
+                  (series_ids,), conn=conn)
+
+    copy_upsert('streaming_providers', ['provider_id', 'provider_name', 'logo_path'],
+                [(p['provider_id'], p['provider_name'], p['logo_path']) for data in rows for p in data['providers']],
+                "ON CONFLICT (provider_id) DO NOTHING", conn=conn)
+    copy_upsert('series_availability', ['tmdb_id', 'provider_id', 'country_code'],
+                [(data['tmdb_id'], p['provider_id'], 'IL') for data in rows for p in data['providers']],
+                "ON CONFLICT DO NOTHING", conn=conn)
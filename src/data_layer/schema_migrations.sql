@@ -0,0 +1,122 @@
+-- =====================================
+-- Series Architect - Schema Migrations
+-- =====================================
+-- Apply after series_architect_backup.sql:
+--   psql -U postgres -d series_architect -f schema_migrations.sql
+-- Every statement is idempotent, so the file can be re-run safely.
+
+
+-- -------------------------------------
+-- series.first_year / series.last_year: sargable decade filtering
+-- -------------------------------------
+-- Stored generated columns, so the decade filter compares plain smallints
+-- (index range scans) instead of calling EXTRACT() on every row.
+
+ALTER TABLE public.series
+    ADD COLUMN IF NOT EXISTS first_year smallint
+        GENERATED ALWAYS AS (EXTRACT(YEAR FROM first_air_date)::smallint) STORED;
+
+ALTER TABLE public.series
+    ADD COLUMN IF NOT EXISTS last_year smallint
+        GENERATED ALWAYS AS (EXTRACT(YEAR FROM last_air_date)::smallint) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_series_years
+    ON public.series (first_year, last_year);
+
+
+-- -------------------------------------
+-- series.content_rating_ord: content rating as an ordinal
+-- -------------------------------------
+-- Same scale as the logic layer's rating order (TV-Y = 0 ... TV-MA = 5);
+-- NR, missing and unknown ratings map to 3. Computed on every write, so
+-- the ETL does not need to know about it.
+
+ALTER TABLE public.series
+    ADD COLUMN IF NOT EXISTS content_rating_ord smallint
+        GENERATED ALWAYS AS (
+            CASE content_rating
+                WHEN 'TV-Y' THEN 0
+                WHEN 'TV-Y7' THEN 1
+                WHEN 'TV-G' THEN 2
+                WHEN 'TV-PG' THEN 3
+                WHEN 'TV-14' THEN 4
+                WHEN 'TV-MA' THEN 5
+                ELSE 3
+            END
+        ) STORED;
+
+
+-- -------------------------------------
+-- series_features: precomputed similarity features
+-- -------------------------------------
+-- One narrow row per series with exactly what the logic layer's feature
+-- matrix needs. Genre and keyword IDs are pre-aggregated (sorted) arrays,
+-- so a batch of series is loaded with a single indexed query.
+-- Refreshed by the data layer after every catalog sync:
+--   REFRESH MATERIALIZED VIEW CONCURRENTLY series_features;
+-- (DROP the view first if its definition below has changed.)
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS public.series_features AS
+SELECT
+    s.tmdb_id,
+    s.first_year AS year,
+    CASE WHEN s.popularity > 0 THEN log(1 + s.popularity) END AS log_pop,
+    NULLIF(s.number_of_seasons, 0)::smallint AS seasons,
+    NULLIF(s.origin_country, '') AS origin_country,
+    s.content_rating_ord AS rating_ord,
+    COALESCE(
+        (SELECT array_agg(sg.genre_id ORDER BY sg.genre_id)
+         FROM public.series_genres sg
+         WHERE sg.tmdb_id = s.tmdb_id),
+        '{}'
+    ) AS genre_ids,
+    COALESCE(
+        (SELECT array_agg(sk.keyword_id ORDER BY sk.keyword_id)
+         FROM public.series_keywords sk
+         WHERE sk.tmdb_id = s.tmdb_id),
+        '{}'
+    ) AS keyword_ids
+FROM public.series s;
+
+-- Required by REFRESH ... CONCURRENTLY (and serves the tmdb_id = ANY(...) lookups)
+CREATE UNIQUE INDEX IF NOT EXISTS idx_series_features_tmdb_id
+    ON public.series_features (tmdb_id);
+
+
+-- -------------------------------------
+-- Title search indexes (search_series)
+-- -------------------------------------
+-- Trigram GIN indexes serve the unanchored title_en/title_he ILIKE '%...%'
+-- search; the text_pattern_ops btrees serve the prefix match used for
+-- queries shorter than a trigram (LOWER(title) LIKE 'ab%').
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_series_title_en_trgm
+    ON public.series USING gin (title_en gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_series_title_he_trgm
+    ON public.series USING gin (title_he gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_series_title_en_prefix
+    ON public.series (LOWER(title_en) text_pattern_ops);
+
+CREATE INDEX IF NOT EXISTS idx_series_title_he_prefix
+    ON public.series (LOWER(title_he) text_pattern_ops);
+
+
+-- -------------------------------------
+-- Popularity top-K indexes (get_popular_series)
+-- -------------------------------------
+-- ORDER BY popularity DESC LIMIT n (optionally per original_language) reads
+-- the first n index entries instead of sorting the table. INCLUDE makes
+-- them covering, so the plan is an Index Only Scan + Limit (once the
+-- visibility map is current, e.g. after VACUUM).
+
+CREATE INDEX IF NOT EXISTS idx_series_popularity_desc
+    ON public.series (popularity DESC)
+    INCLUDE (tmdb_id, title_en, title_he, first_air_date, poster_path);
+
+CREATE INDEX IF NOT EXISTS idx_series_language_popularity
+    ON public.series (original_language, popularity DESC)
+    INCLUDE (tmdb_id, title_en, title_he, first_air_date, poster_path);
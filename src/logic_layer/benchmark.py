@@ -5,28 +5,17 @@ Compares our recommendation engine with TMDB's Similar API.
 Helps validate that our algorithm produces reasonable results.
 """
 
-import sys
-import os
-import requests
 import time
+import numpy as np
+import orjson
 
-# Add parent directories to path
-current_dir = os.path.dirname(os.path.abspath(__file__))
-parent_dir = os.path.dirname(current_dir)
-sys.path.insert(0, parent_dir)
-sys.path.insert(0, current_dir)
+from src.data_layer.db_utils import fetch_query
+from src.data_layer.etl_processor import SESSION
 
-from data_layer.db_utils import fetch_query
-from data_layer.etl_processor import HEADERS
-
-try:
-    from .recommender import get_recommendations
-    from .similarity_engine import find_most_similar
-    from .filters import get_all_series_ids
-except ImportError:
-    from recommender import get_recommendations
-    from similarity_engine import find_most_similar
-    from filters import get_all_series_ids
+from src.logic_layer.recommender import get_recommendations
+from src.logic_layer.similarity_engine import find_most_similar
+from src.logic_layer.filters import get_all_series_ids
+from src.logic_layer.feature_builder import init_kernel_threads
 
 
 # =====================================
@@ -51,10 +40,10 @@ def get_tmdb_similar(tmdb_id, limit=10):
     }
     
     try:
-        response = requests.get(url, headers=HEADERS, params=params)
+        response = SESSION.get(url, params=params)
         response.raise_for_status()
         
-        results = response.json().get('results', [])
+        results = orjson.loads(response.content).get('results', [])
         similar_ids = [s['id'] for s in results[:limit]]
         
         return similar_ids
@@ -64,10 +53,32 @@ def get_tmdb_similar(tmdb_id, limit=10):
         return []
 
 
+def get_series_titles(tmdb_ids):
+    """
+    Get English titles for many series in a single query.
+    
+    Args:
+        tmdb_ids: Iterable of series IDs
+    
+    Returns:
+        dict: {tmdb_id: title_en}
+    """
+    ids = list(set(tmdb_ids))
+    if not ids:
+        return {}
+    
+    rows = fetch_query("SELECT tmdb_id, title_en FROM series WHERE tmdb_id = ANY(%s)", (ids,))
+    return dict(rows)
+
+
 # =====================================
 # Benchmark Functions
 # =====================================
 
+# Above this size (on both sides) overlap uses numpy's sorted-array intersection
+OVERLAP_NUMPY_THRESHOLD = 64
+
+
 def calculate_overlap(our_recommendations, tmdb_recommendations):
     """
     Calculate overlap between our recommendations and TMDB's.
@@ -82,7 +93,15 @@ def calculate_overlap(our_recommendations, tmdb_recommendations):
     our_set = set(our_recommendations)
     tmdb_set = set(tmdb_recommendations)
     
-    overlap = our_set & tmdb_set
+    if len(our_set) > OVERLAP_NUMPY_THRESHOLD and len(tmdb_set) > OVERLAP_NUMPY_THRESHOLD:
+        overlap = np.intersect1d(
+            np.fromiter(our_set, dtype=np.int64, count=len(our_set)),
+            np.fromiter(tmdb_set, dtype=np.int64, count=len(tmdb_set)),
+            assume_unique=True
+        ).tolist()
+    else:
+        overlap = our_set & tmdb_set
+    
     overlap_count = len(overlap)
     overlap_percentage = (overlap_count / len(tmdb_set) * 100) if tmdb_set else 0
     
@@ -95,7 +114,7 @@ def calculate_overlap(our_recommendations, tmdb_recommendations):
     }
 
 
-def benchmark_single_series(tmdb_id, top_n=10):
+def benchmark_single_series(tmdb_id, top_n=10, candidate_ids=None, series_name=None):
     """
     Benchmark recommendations for a single series.
     
@@ -105,6 +124,8 @@ def benchmark_single_series(tmdb_id, top_n=10):
     Args:
         tmdb_id: Series to test
         top_n: Number of recommendations
+        candidate_ids: Candidate pool (default: all series IDs)
+        series_name: Series title, if already known
     
     Returns:
         dict: Benchmark results
@@ -114,14 +135,16 @@ def benchmark_single_series(tmdb_id, top_n=10):
     print(f"{'='*60}")
     
     # Get series name
-    query = "SELECT title_en FROM series WHERE tmdb_id = %s"
-    result = fetch_query(query, (tmdb_id,))
-    series_name = result[0][0] if result else "Unknown"
+    if series_name is None:
+        query = "SELECT title_en FROM series WHERE tmdb_id = %s"
+        result = fetch_query(query, (tmdb_id,))
+        series_name = result[0][0] if result else "Unknown"
     
     print(f"Series: {series_name}")
     
     # Get all series IDs as candidates
-    candidate_ids = get_all_series_ids()
+    if candidate_ids is None:
+        candidate_ids = get_all_series_ids()
     
     # Our recommendations
     print(f"\nCalculating our recommendations...")
@@ -144,20 +167,18 @@ def benchmark_single_series(tmdb_id, top_n=10):
     if overlap['matching_series']:
         print(f"\nMatching series IDs: {overlap['matching_series']}")
     
-    # Get names for comparison
+    # Get names for comparison (one query for both lists)
+    name_by_id = get_series_titles(our_ids + tmdb_ids)
+    
     print(f"\n--- Our Top {top_n} ---")
     for i, (rec_id, score) in enumerate(our_recs, 1):
-        query = "SELECT title_en FROM series WHERE tmdb_id = %s"
-        result = fetch_query(query, (rec_id,))
-        name = result[0][0] if result else "Unknown"
+        name = name_by_id.get(rec_id) or "Unknown"
         match = "✓" if rec_id in tmdb_ids else " "
         print(f"{i}. [{match}] {name} (score: {score:.3f})")
     
     print(f"\n--- TMDB Top {top_n} ---")
     for i, rec_id in enumerate(tmdb_ids, 1):
-        query = "SELECT title_en FROM series WHERE tmdb_id = %s"
-        result = fetch_query(query, (rec_id,))
-        name = result[0][0] if result else "Unknown"
+        name = name_by_id.get(rec_id) or "Unknown"
         match = "✓" if rec_id in our_ids else " "
         print(f"{i}. [{match}] {name}")
     
@@ -192,6 +213,9 @@ def benchmark_user_recommendations(user_ratings, filters=None, top_n=10):
     
     # Get liked series names
     print(f"\nUser's Liked Series:")
+    liked_ids = [r[0] for r in user_ratings if r[1] == 1]  # Like only
+    name_by_id = get_series_titles(liked_ids)
+    
     liked_series = []
     for rating_tuple in user_ratings:
         tmdb_id = rating_tuple[0]
@@ -199,9 +223,7 @@ def benchmark_user_recommendations(user_ratings, filters=None, top_n=10):
         is_anchor = rating_tuple[2] if len(rating_tuple) > 2 else False
         
         if rating == 1:  # Like
-            query = "SELECT title_en FROM series WHERE tmdb_id = %s"
-            result = fetch_query(query, (tmdb_id,))
-            name = result[0][0] if result else "Unknown"
+            name = name_by_id.get(tmdb_id) or "Unknown"
             anchor_mark = " (ANCHOR)" if is_anchor else ""
             print(f"  👍 {name}{anchor_mark}")
             liked_series.append(name)
@@ -221,25 +243,24 @@ def benchmark_user_recommendations(user_ratings, filters=None, top_n=10):
     # For each liked series, show TMDB similar and check overlap
     print(f"\n--- TMDB Similar to Each Liked Series ---")
     all_tmdb_suggestions = set()
+    similar_by_liked = []
     
-    for rating_tuple in user_ratings:
-        if rating_tuple[1] == 1:  # Like only
-            tmdb_id = rating_tuple[0]
-            query = "SELECT title_en FROM series WHERE tmdb_id = %s"
-            result = fetch_query(query, (tmdb_id,))
-            name = result[0][0] if result else "Unknown"
-            
-            tmdb_similar = get_tmdb_similar(tmdb_id, limit=5)
-            all_tmdb_suggestions.update(tmdb_similar)
-            
-            print(f"\nSimilar to '{name}':")
-            for sim_id in tmdb_similar[:3]:
-                query = "SELECT title_en FROM series WHERE tmdb_id = %s"
-                result = fetch_query(query, (sim_id,))
-                sim_name = result[0][0] if result else "Unknown"
-                print(f"  - {sim_name}")
-            
-            time.sleep(0.3)  # Rate limiting
+    for tmdb_id in liked_ids:
+        tmdb_similar = get_tmdb_similar(tmdb_id, limit=5)
+        all_tmdb_suggestions.update(tmdb_similar)
+        similar_by_liked.append((tmdb_id, tmdb_similar))
+        
+        time.sleep(0.3)  # Rate limiting
+    
+    # Resolve every suggested title in one query
+    name_by_id.update(get_series_titles(all_tmdb_suggestions))
+    
+    for tmdb_id, tmdb_similar in similar_by_liked:
+        name = name_by_id.get(tmdb_id) or "Unknown"
+        print(f"\nSimilar to '{name}':")
+        for sim_id in tmdb_similar[:3]:
+            sim_name = name_by_id.get(sim_id) or "Unknown"
+            print(f"  - {sim_name}")
     
     # Check overlap with TMDB suggestions
     our_ids = [rec['tmdb_id'] for rec in recommendations]
@@ -280,17 +301,25 @@ def run_benchmark_suite():
     results = []
     total_overlap = 0
     
+    # Check which test series exist in our DB with a single query
+    name_by_id = get_series_titles(tmdb_id for tmdb_id, _ in test_cases)
+    
+    # The candidate pool is the same for every test case
+    candidates = get_all_series_ids()
+    
     for tmdb_id, expected_name in test_cases:
         # Verify series exists in our DB
-        query = "SELECT title_en FROM series WHERE tmdb_id = %s"
-        result = fetch_query(query, (tmdb_id,))
-        
-        if not result:
+        if tmdb_id not in name_by_id:
             print(f"\n⚠️  Skipping {expected_name} (ID: {tmdb_id}) - not in database")
             continue
         
         # Run benchmark
-        benchmark_result = benchmark_single_series(tmdb_id, top_n=10)
+        benchmark_result = benchmark_single_series(
+            tmdb_id,
+            top_n=10,
+            candidate_ids=candidates,
+            series_name=name_by_id[tmdb_id]
+        )
         results.append(benchmark_result)
         
         total_overlap += benchmark_result['overlap']['overlap_percentage']
@@ -328,6 +357,8 @@ def run_benchmark_suite():
 # =====================================
 
 if __name__ == "__main__":
+    init_kernel_threads()
+    
     print("\nSeries Architect - Benchmark Tool")
     print("=" * 60)
     
@@ -5,6 +5,8 @@ This file contains all constants, weights, and settings for the recommendation e
 Centralizing these values makes it easy to tune the algorithm without changing code.
 """
 
+import os
+
 # =====================================
 # Feature Weights (Must sum to 1.0)
 # =====================================
@@ -68,6 +70,23 @@ SEASONS_DIFF_MAX = 5        # Maximum season difference for similarity
 # =====================================
 MAX_CANDIDATES = 10000      # Maximum series to consider (safety limit)
 
+# =====================================
+# Caching
+# =====================================
+FEATURE_CACHE_SIZE = 50000  # Max series kept per feature cache (LRU eviction)
+STATS_CACHE_TTL = 60        # Seconds get_recommendation_stats() results are reused
+SEARCH_CACHE_TTL = 30       # Seconds search_series() results are reused
+SEARCH_CACHE_SIZE = 1024    # Max distinct (query, limit) searches kept
+
+# =====================================
+# Parallelism
+# =====================================
+# Threads scoring candidates (NumPy chunks / compiled kernels). Set
+# SERIESARCHITECT_NUM_THREADS to limit it, e.g. with several server workers per host
+SIMILARITY_WORKERS = int(os.environ.get('SERIESARCHITECT_NUM_THREADS', 0)) or os.cpu_count() or 1
+PARALLEL_MIN_CANDIDATES = 5000  # Smaller batches are scored in the calling thread
+COMPILED_PARALLEL_MIN_CANDIDATES = 128  # Smaller batches use the serial compiled kernel
+
 # =====================================
 # TMDB Reference Data (from actual database)
 # =====================================
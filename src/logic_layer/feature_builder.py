@@ -5,58 +5,160 @@ Builds numerical feature vectors for each series.
 These vectors are used to calculate cosine similarity between series.
 """
 
-import sys
 import os
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from functools import lru_cache, wraps
 import numpy as np
 from math import log10
 
-# Add parent directory to path
-current_dir = os.path.dirname(os.path.abspath(__file__))
-parent_dir = os.path.dirname(current_dir)
-sys.path.insert(0, parent_dir)
+try:
+    import numba
+    from numba import njit, prange
+except ImportError:  # numba is optional; the NumPy path below is used instead
+    njit = None
 
-from data_layer.db_utils import fetch_query
+from src.data_layer.db_utils import fetch_query, fetch_prepared
 
-try:
-    from .config import (
-        FEATURE_WEIGHTS,
-        TOP_KEYWORDS_COUNT,
-        DECADE_DIFF_MAX,
-        POPULARITY_LOG_BASE,
-        SEASONS_DIFF_MAX,
-        DEBUG_MODE
-    )
-except ImportError:
-    from config import (
-        FEATURE_WEIGHTS,
-        TOP_KEYWORDS_COUNT,
-        DECADE_DIFF_MAX,
-        POPULARITY_LOG_BASE,
-        SEASONS_DIFF_MAX,
-        DEBUG_MODE
-    )
+from src.logic_layer.config import (
+    FEATURE_WEIGHTS,
+    TOP_KEYWORDS_COUNT,
+    DECADE_DIFF_MAX,
+    POPULARITY_LOG_BASE,
+    SEASONS_DIFF_MAX,
+    FEATURE_CACHE_SIZE,
+    SIMILARITY_WORKERS,
+    PARALLEL_MIN_CANDIDATES,
+    COMPILED_PARALLEL_MIN_CANDIDATES,
+    DEBUG_MODE
+)
+
+# Held around every call of a parallel compiled kernel. Until
+# init_kernel_threads() has found a thread-safe Numba threading layer, the
+# calls are serialized (Numba's workqueue layer aborts the process when
+# parallel kernels are entered from several threads at once).
+_PARALLEL_LOCK = threading.Lock()
 
 
 # =====================================
 # Cache for optimization
 # =====================================
-_SERIES_CACHE = {}
-_GENRES_CACHE = {}
-_KEYWORDS_CACHE = {}
+# The per-series getters below are memoized in bounded LRU caches that can be
+# asked which IDs they hold: prefetch_*() query only the IDs that are not
+# cached and store the batch results straight into them. A getter that finds
+# nothing (None) does not cache it, since fetch_*() also return nothing on a
+# database error.
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+_MISSING = object()
+
+
+class _FeatureCache:
+    """Thread-safe LRU dict (least recently used entries evicted beyond maxsize)."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        """Cached value of `key` (marked as recently used), or _MISSING."""
+        with self._lock:
+            value = self._entries.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def cache_clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def cache_info(self):
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._entries))
+
+
+_CACHES = {kind: _FeatureCache(FEATURE_CACHE_SIZE) for kind in ('series', 'genres', 'keywords', 'features')}
+
+
+def _cached(kind):
+    """Memoize a tmdb_id -> value getter in _CACHES[kind] (None results are not cached)."""
+    cache = _CACHES[kind]
+
+    def decorate(fetch):
+        @wraps(fetch)
+        def getter(tmdb_id):
+            value = cache.get(tmdb_id)
+            if value is _MISSING:
+                value = fetch(tmdb_id)
+                if value is not None:
+                    cache.put(tmdb_id, value)
+            return value
+        
+        getter.cache_clear = cache.cache_clear
+        getter.cache_info = cache.cache_info
+        return getter
+    
+    return decorate
+
+
+# Genre/keyword bitsets: each id in a vocabulary owns one bit
+_GENRE_VOCAB = {}
+_KEYWORD_VOCAB = {}
+_VOCAB_LOCK = threading.Lock()
 
 
 def clear_cache():
     """Clear all caches (useful for testing)."""
-    global _SERIES_CACHE, _GENRES_CACHE, _KEYWORDS_CACHE
-    _SERIES_CACHE = {}
-    _GENRES_CACHE = {}
-    _KEYWORDS_CACHE = {}
+    for getter in _CACHED_GETTERS:
+        getter.cache_clear()
+    _features_view.clear()
+    with _VOCAB_LOCK:
+        _GENRE_VOCAB.clear()
+        _KEYWORD_VOCAB.clear()
+    _reset_soa()
+
+
+def cache_info():
+    """
+    Hit/miss statistics of the feature caches.
+    
+    Returns:
+        dict: {getter name: functools CacheInfo}
+    """
+    return {getter.__name__: getter.cache_info() for getter in _CACHED_GETTERS}
 
 
 # =====================================
 # Data Fetching Functions
 # =====================================
 
+# Columns of a series data dict, in SELECT order
+_SERIES_COLUMNS = (
+    'tmdb_id', 'title_en', 'title_he', 'overview', 'popularity', 'poster_path',
+    'original_language', 'origin_country', 'status', 'adult',
+    'first_air_date', 'last_air_date', 'number_of_seasons',
+    'number_of_episodes', 'content_rating'
+)
+
+
+@_cached('series')
 def get_series_data(tmdb_id):
     """
     Fetch all data for a series from database.
@@ -65,45 +167,21 @@ def get_series_data(tmdb_id):
     Returns:
         dict: Series data or None if not found
     """
-    if tmdb_id in _SERIES_CACHE:
-        return _SERIES_CACHE[tmdb_id]
-    
-    query = """
-        SELECT tmdb_id, title_en, overview, popularity, poster_path,
-               original_language, origin_country, status, adult,
-               first_air_date, last_air_date, number_of_seasons,
-               number_of_episodes, content_rating
+    query = f"""
+        SELECT {', '.join(_SERIES_COLUMNS)}
         FROM series
-        WHERE tmdb_id = %s
+        WHERE tmdb_id = $1
     """
     
-    result = fetch_query(query, (tmdb_id,))
+    result = fetch_prepared('series_row', query, (tmdb_id,))
     
     if not result:
         return None
     
-    row = result[0]
-    data = {
-        'tmdb_id': row[0],
-        'title_en': row[1],
-        'overview': row[2],
-        'popularity': row[3],
-        'poster_path': row[4],
-        'original_language': row[5],
-        'origin_country': row[6],
-        'status': row[7],
-        'adult': row[8],
-        'first_air_date': row[9],
-        'last_air_date': row[10],
-        'number_of_seasons': row[11],
-        'number_of_episodes': row[12],
-        'content_rating': row[13]
-    }
-    
-    _SERIES_CACHE[tmdb_id] = data
-    return data
+    return dict(zip(_SERIES_COLUMNS, result[0]))
 
 
+@_cached('genres')
 def get_series_genres(tmdb_id):
     """
     Get list of genre_ids for a series.
@@ -112,22 +190,30 @@ def get_series_genres(tmdb_id):
     Returns:
         set: Set of genre_ids
     """
-    if tmdb_id in _GENRES_CACHE:
-        return _GENRES_CACHE[tmdb_id]
+    query = "SELECT genre_id FROM series_genres WHERE tmdb_id = $1"
+    results = fetch_prepared('series_genre_ids', query, (tmdb_id,))
     
-    query = "SELECT genre_id FROM series_genres WHERE tmdb_id = %s"
-    results = fetch_query(query, (tmdb_id,))
+    return set(row[0] for row in results)
+
+
+@_cached('keywords')
+def _get_keyword_ids(tmdb_id):
+    """
+    Get all keyword_ids of a series, sorted (one cache entry per series).
     
-    genres = set(row[0] for row in results)
-    _GENRES_CACHE[tmdb_id] = genres
+    Returns:
+        tuple: Sorted keyword_ids
+    """
+    query = "SELECT keyword_id FROM series_keywords WHERE tmdb_id = $1 ORDER BY keyword_id"
+    results = fetch_prepared('series_keyword_ids', query, (tmdb_id,))
     
-    return genres
+    return tuple(row[0] for row in results)
 
 
 def get_series_keywords(tmdb_id, top_n=None):
     """
     Get list of keyword_ids for a series.
-    Uses caching.
+    Uses caching (the full keyword list is cached once and sliced here).
     
     Args:
         tmdb_id: Series ID
@@ -136,23 +222,284 @@ def get_series_keywords(tmdb_id, top_n=None):
     Returns:
         set: Set of keyword_ids
     """
-    cache_key = (tmdb_id, top_n)
+    # Note: TMDB doesn't provide keyword weights, so we just take the first N by id
+    keywords = _get_keyword_ids(tmdb_id)
     
-    if cache_key in _KEYWORDS_CACHE:
-        return _KEYWORDS_CACHE[cache_key]
+    return set(keywords[:top_n] if top_n else keywords)
+
+
+def prefetch_series(ids):
+    """
+    Load many series into the cache with a single query.
+    Series that are already cached are skipped.
+    
+    Args:
+        ids: Iterable of series IDs
+    """
+    missing = [tmdb_id for tmdb_id in set(ids) if tmdb_id not in _CACHES['series']]
+    if not missing:
+        return
+    
+    query = f"""
+        SELECT {', '.join(_SERIES_COLUMNS)}
+        FROM series
+        WHERE tmdb_id = ANY(%s)
+    """
+    # IDs not found are left uncached (a failed query returns no rows either)
+    for row in fetch_query(query, (missing,)):
+        _CACHES['series'].put(row[0], dict(zip(_SERIES_COLUMNS, row)))
+
+
+def prefetch_genres(ids):
+    """
+    Load the genre sets of many series into the cache with a single query
+    (aggregated per series on the server).
+    
+    Args:
+        ids: Iterable of series IDs
+    """
+    missing = [tmdb_id for tmdb_id in set(ids) if tmdb_id not in _CACHES['genres']]
+    if not missing:
+        return
+    
+    query = """
+        SELECT tmdb_id, array_agg(genre_id)
+        FROM series_genres
+        WHERE tmdb_id = ANY(%s)
+        GROUP BY tmdb_id
+    """
+    found = {row[0]: set(row[1]) for row in fetch_query(query, (missing,))}
+    
+    for tmdb_id in missing:
+        _CACHES['genres'].put(tmdb_id, found.get(tmdb_id, set()))
+
+
+def prefetch_keywords(ids):
+    """
+    Load the keyword lists of many series into the cache with a single query
+    (aggregated and sorted per series on the server).
     
-    # Note: TMDB doesn't provide keyword weights, so we just take first N
-    query = "SELECT keyword_id FROM series_keywords WHERE tmdb_id = %s"
+    Args:
+        ids: Iterable of series IDs
+    """
+    missing = [tmdb_id for tmdb_id in set(ids) if tmdb_id not in _CACHES['keywords']]
+    if not missing:
+        return
     
-    if top_n:
-        query += f" LIMIT {top_n}"
+    query = """
+        SELECT tmdb_id, array_agg(keyword_id ORDER BY keyword_id)
+        FROM series_keywords
+        WHERE tmdb_id = ANY(%s)
+        GROUP BY tmdb_id
+    """
+    found = {row[0]: tuple(row[1]) for row in fetch_query(query, (missing,))}
     
-    results = fetch_query(query, (tmdb_id,))
+    for tmdb_id in missing:
+        _CACHES['keywords'].put(tmdb_id, found.get(tmdb_id, ()))
+
+
+# Scalar columns of the series_features materialized view (schema_migrations.sql)
+_FEATURE_COLUMNS = ('year', 'log_pop', 'seasons', 'origin_country', 'rating_ord')
+
+
+# Result of the series_features lookup, once it has succeeded
+_features_view = {}
+
+
+def _has_features_view():
+    """Whether the series_features materialized view exists in the database."""
+    exists = _features_view.get('exists')
+    if exists is None:
+        result = fetch_query("SELECT to_regclass('series_features') IS NOT NULL")
+        if not result:
+            # fetch_query() returns [] on a database error - look again next time
+            return False
+        exists = _features_view['exists'] = bool(result[0][0])
+    return exists
+
+
+@_cached('features')
+def get_series_features(tmdb_id):
+    """
+    Get the precomputed similarity features of a series.
+    Reads the narrow series_features view when it exists, otherwise
+    derives the same values from get_series_data().
     
-    keywords = set(row[0] for row in results)
-    _KEYWORDS_CACHE[cache_key] = keywords
+    Returns:
+        dict: year, log_pop, seasons, origin_country (None for unknown values)
+              and rating_ord (content rating ordinal), or None if not found
+    """
+    if _has_features_view():
+        query = f"""
+            SELECT {', '.join(_FEATURE_COLUMNS)}
+            FROM series_features
+            WHERE tmdb_id = $1
+        """
+        result = fetch_prepared('series_feature_row', query, (tmdb_id,))
+        return dict(zip(_FEATURE_COLUMNS, result[0])) if result else None
+    
+    data = get_series_data(tmdb_id)
+    if data is None:
+        return None
     
-    return keywords
+    log_pop = log10(1 + data['popularity']) if data['popularity'] and data['popularity'] > 0 else None
+    return _features_from_data(data, log_pop)
+
+
+def _features_from_data(data, log_pop):
+    """Feature dict of a series data dict (log_pop is computed by the caller)."""
+    return {
+        'year': data['first_air_date'].year if data['first_air_date'] else None,
+        'log_pop': log_pop,
+        'seasons': data['number_of_seasons'] or None,
+        'origin_country': data['origin_country'] or None,
+        'rating_ord': _RATING_ORDER.get(data['content_rating'], 3)
+    }
+
+
+def _derive_features(ids):
+    """
+    Stage features derived from cached series data for many series at once
+    (the fallback when the series_features view is missing). log10 of the
+    popularity is taken over the whole batch in one NumPy call.
+    """
+    missing = [tmdb_id for tmdb_id in ids if tmdb_id not in _CACHES['features']]
+    if not missing:
+        return
+    
+    rows = [get_series_data(tmdb_id) for tmdb_id in missing]
+    popularity = np.array([(data or {}).get('popularity') or 0.0 for data in rows], dtype=np.float64)
+    log_pop = np.log10(1 + popularity)
+    
+    for tmdb_id, data, pop, log_value in zip(missing, rows, popularity.tolist(), log_pop.tolist()):
+        if data:
+            _CACHES['features'].put(tmdb_id, _features_from_data(data, log_value if pop > 0 else None))
+
+
+def prefetch_features(ids):
+    """
+    Load the features, genre sets and keyword sets of many series with a
+    single query on the series_features view. Without the view, falls back
+    to prefetch_series(), prefetch_genres() and prefetch_keywords().
+    
+    Args:
+        ids: Iterable of series IDs
+    """
+    ids = set(ids)
+    
+    if not _has_features_view():
+        prefetch_series(ids)
+        prefetch_genres(ids)
+        prefetch_keywords(ids)
+        _derive_features(ids)
+        return
+    
+    missing = [
+        tmdb_id for tmdb_id in ids
+        if tmdb_id not in _CACHES['features']
+        or tmdb_id not in _CACHES['genres']
+        or tmdb_id not in _CACHES['keywords']
+    ]
+    if not missing:
+        return
+    
+    query = f"""
+        SELECT tmdb_id, {', '.join(_FEATURE_COLUMNS)}, genre_ids, keyword_ids
+        FROM series_features
+        WHERE tmdb_id = ANY(%s)
+    """
+    found = {row[0]: row[1:] for row in fetch_query(query, (missing,))}
+    
+    for tmdb_id in missing:
+        row = found.get(tmdb_id)
+        
+        if row and tmdb_id not in _CACHES['features']:
+            _CACHES['features'].put(tmdb_id, dict(zip(_FEATURE_COLUMNS, row)))
+        
+        if tmdb_id not in _CACHES['genres']:
+            _CACHES['genres'].put(tmdb_id, set(row[-2]) if row else set())
+        
+        if tmdb_id not in _CACHES['keywords']:
+            _CACHES['keywords'].put(tmdb_id, tuple(row[-1]) if row else ())
+
+
+# =====================================
+# Bitset Representation
+# =====================================
+
+if hasattr(np, 'bitwise_count'):
+    _popcount = np.bitwise_count
+else:
+    def _popcount(bits):
+        """Per-word set-bit count (fallback for NumPy < 2.0)."""
+        as_bytes = np.ascontiguousarray(bits).view(np.uint8).reshape(bits.shape + (8,))
+        return np.unpackbits(as_bytes, axis=-1).sum(axis=-1)
+
+
+def _to_bitset(ids, vocab):
+    """
+    Encode a set of ids as a packed uint64 bitset.
+    New ids are interned into `vocab` (id -> bit position) on the fly.
+    """
+    with _VOCAB_LOCK:
+        positions = [vocab.setdefault(x, len(vocab)) for x in ids]
+    
+    bits = np.zeros(max(1, (max(positions, default=0) >> 6) + 1), dtype=np.uint64)
+    for pos in positions:
+        bits[pos >> 6] |= np.uint64(1 << (pos & 63))
+    
+    return bits
+
+
+def _pad_bits(bits, width):
+    """Zero-extend a bitset to `width` words (the vocabulary may have grown since it was built)."""
+    if len(bits) >= width:
+        return bits
+    return np.concatenate([bits, np.zeros(width - len(bits), dtype=np.uint64)])
+
+
+@lru_cache(maxsize=FEATURE_CACHE_SIZE)
+def get_series_genre_bits(tmdb_id):
+    """
+    Get the genres of a series as a packed bitset.
+    Uses caching.
+    
+    Returns:
+        np.ndarray: uint64 words
+    """
+    return _to_bitset(get_series_genres(tmdb_id), _GENRE_VOCAB)
+
+
+@lru_cache(maxsize=FEATURE_CACHE_SIZE)
+def get_series_keyword_bits(tmdb_id):
+    """
+    Get the top keywords (TOP_KEYWORDS_COUNT) of a series as a packed bitset.
+    Uses caching.
+    
+    Returns:
+        np.ndarray: uint64 words
+    """
+    return _to_bitset(get_series_keywords(tmdb_id, top_n=TOP_KEYWORDS_COUNT), _KEYWORD_VOCAB)
+
+
+def _stack_bits(bitsets):
+    """Stack bitsets into one zero-padded (N, W) uint64 matrix."""
+    width = max((len(bits) for bits in bitsets), default=1)
+    matrix = np.zeros((len(bitsets), width), dtype=np.uint64)
+    for i, bits in enumerate(bitsets):
+        matrix[i, :len(bits)] = bits
+    return matrix
+
+
+# Memoized getters, cleared together by clear_cache()
+_CACHED_GETTERS = (
+    get_series_data,
+    get_series_genres,
+    _get_keyword_ids,
+    get_series_features,
+    get_series_genre_bits,
+    get_series_keyword_bits
+)
 
 
 # =====================================
@@ -163,7 +510,8 @@ def jaccard_similarity(set_a, set_b):
     """
     Calculate Jaccard similarity between two sets.
     
-    Formula: |A ∩ B| / |A ∪ B|
+    Formula: |A ∩ B| / |A ∪ B|, with |A ∪ B| = |A| + |B| - |A ∩ B|
+    (only the intersection is materialized)
     
     Returns:
         float: Similarity score between 0 and 1
@@ -172,12 +520,76 @@ def jaccard_similarity(set_a, set_b):
         return 0.0
     
     intersection = len(set_a & set_b)
-    union = len(set_a | set_b)
     
+    return intersection / (len(set_a) + len(set_b) - intersection)
+
+
+def jaccard_bitset(a_bits, b_bits):
+    """
+    Jaccard similarity of two packed bitsets.
+    
+    Formula: popcount(A & B) / popcount(A | B)
+    
+    Returns:
+        float: Similarity score between 0 and 1 (0 if either set is empty)
+    """
+    width = max(len(a_bits), len(b_bits))
+    a_bits = _pad_bits(a_bits, width)
+    b_bits = _pad_bits(b_bits, width)
+    
+    inter = int(_popcount(a_bits & b_bits).sum())
+    union = int(_popcount(a_bits).sum()) + int(_popcount(b_bits).sum()) - inter
     if union == 0:
         return 0.0
     
-    return intersection / union
+    return inter / union
+
+
+if njit is not None:
+    @njit(cache=True)
+    def _popcount64(x):
+        """Set-bit count of one uint64 word (SWAR bit trick)."""
+        x = x - ((x >> np.uint64(1)) & np.uint64(0x5555555555555555))
+        x = (x & np.uint64(0x3333333333333333)) + ((x >> np.uint64(2)) & np.uint64(0x3333333333333333))
+        x = (x + (x >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+        return (x * np.uint64(0x0101010101010101)) >> np.uint64(56)
+
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _jaccard_batch_numba(cand_bits, ref_bits):
+        """Compiled row-parallel Jaccard of an (N, W) uint64 matrix against one (W,) bitset."""
+        out = np.empty(cand_bits.shape[0], np.float64)
+        for i in prange(cand_bits.shape[0]):
+            inter = 0
+            union = 0
+            for j in range(ref_bits.shape[0]):
+                a = cand_bits[i, j]
+                b = ref_bits[j]
+                inter += _popcount64(a & b)
+                union += _popcount64(a | b)
+            out[i] = inter / union if union else 0.0
+        return out
+
+
+def jaccard_bitset_batch(cand_bits, ref_bits):
+    """
+    Jaccard similarity of every row of an (N, W) bitset matrix against one bitset.
+    
+    Returns:
+        np.ndarray: N similarity scores
+    """
+    width = max(cand_bits.shape[1], len(ref_bits))
+    if cand_bits.shape[1] < width:
+        cand_bits = np.pad(cand_bits, ((0, 0), (0, width - cand_bits.shape[1])))
+    ref_bits = _pad_bits(ref_bits, width)
+    
+    if njit is not None:
+        with _PARALLEL_LOCK:
+            return _jaccard_batch_numba(np.ascontiguousarray(cand_bits), ref_bits)
+    
+    inter = _popcount(cand_bits & ref_bits).sum(axis=1)
+    union = _popcount(cand_bits | ref_bits).sum(axis=1)
+    
+    return np.where(union > 0, inter / np.maximum(union, 1), 0.0)
 
 
 def calculate_genres_similarity(tmdb_id_a, tmdb_id_b):
@@ -187,10 +599,7 @@ def calculate_genres_similarity(tmdb_id_a, tmdb_id_b):
     Returns:
         float: Similarity score between 0 and 1
     """
-    genres_a = get_series_genres(tmdb_id_a)
-    genres_b = get_series_genres(tmdb_id_b)
-    
-    return jaccard_similarity(genres_a, genres_b)
+    return jaccard_bitset(get_series_genre_bits(tmdb_id_a), get_series_genre_bits(tmdb_id_b))
 
 
 def calculate_keywords_similarity(tmdb_id_a, tmdb_id_b):
@@ -200,10 +609,7 @@ def calculate_keywords_similarity(tmdb_id_a, tmdb_id_b):
     Returns:
         float: Similarity score between 0 and 1
     """
-    keywords_a = get_series_keywords(tmdb_id_a, top_n=TOP_KEYWORDS_COUNT)
-    keywords_b = get_series_keywords(tmdb_id_b, top_n=TOP_KEYWORDS_COUNT)
-    
-    return jaccard_similarity(keywords_a, keywords_b)
+    return jaccard_bitset(get_series_keyword_bits(tmdb_id_a), get_series_keyword_bits(tmdb_id_b))
 
 
 def calculate_year_proximity(tmdb_id_a, tmdb_id_b):
@@ -221,6 +627,11 @@ def calculate_year_proximity(tmdb_id_a, tmdb_id_b):
     if not data_a or not data_b:
         return 0.0
     
+    return _calc_year_from_data(data_a, data_b)
+
+
+def _calc_year_from_data(data_a, data_b):
+    """Year proximity of two already-fetched series data dicts."""
     date_a = data_a.get('first_air_date')
     date_b = data_b.get('first_air_date')
     
@@ -251,6 +662,11 @@ def calculate_origin_country_similarity(tmdb_id_a, tmdb_id_b):
     if not data_a or not data_b:
         return 0.0
     
+    return _calc_country_from_data(data_a, data_b)
+
+
+def _calc_country_from_data(data_a, data_b):
+    """Origin country similarity of two already-fetched series data dicts."""
     country_a = data_a.get('origin_country')
     country_b = data_b.get('origin_country')
     
@@ -275,6 +691,11 @@ def calculate_popularity_similarity(tmdb_id_a, tmdb_id_b):
     if not data_a or not data_b:
         return 0.0
     
+    return _calc_popularity_from_data(data_a, data_b)
+
+
+def _calc_popularity_from_data(data_a, data_b):
+    """Popularity similarity of two already-fetched series data dicts."""
     pop_a = data_a.get('popularity', 0)
     pop_b = data_b.get('popularity', 0)
     
@@ -296,6 +717,19 @@ def calculate_popularity_similarity(tmdb_id_a, tmdb_id_b):
     return max(0.0, similarity)
 
 
+# Rating hierarchy (lower number = more restrictive); shared by the
+# per-pair function and the vectorized feature matrix
+_RATING_ORDER = {
+    'TV-Y': 0,
+    'TV-Y7': 1,
+    'TV-G': 2,
+    'TV-PG': 3,
+    'TV-14': 4,
+    'TV-MA': 5,
+    'NR': 3  # Not Rated = assume middle ground
+}
+
+
 def calculate_content_rating_similarity(tmdb_id_a, tmdb_id_b):
     """
     Calculate content rating similarity using ordinal distance.
@@ -305,29 +739,23 @@ def calculate_content_rating_similarity(tmdb_id_a, tmdb_id_b):
     Returns:
         float: Similarity score between 0 and 1
     """
-    # Rating hierarchy (lower number = more restrictive)
-    RATING_ORDER = {
-        'TV-Y': 0,
-        'TV-Y7': 1,
-        'TV-G': 2,
-        'TV-PG': 3,
-        'TV-14': 4,
-        'TV-MA': 5,
-        'NR': 3  # Not Rated = assume middle ground
-    }
-    
     data_a = get_series_data(tmdb_id_a)
     data_b = get_series_data(tmdb_id_b)
     
     if not data_a or not data_b:
         return 0.0
     
+    return _calc_content_rating_from_data(data_a, data_b)
+
+
+def _calc_content_rating_from_data(data_a, data_b):
+    """Content rating similarity of two already-fetched series data dicts."""
     rating_a = data_a.get('content_rating', 'NR')
     rating_b = data_b.get('content_rating', 'NR')
     
     # Get ordinal values
-    ord_a = RATING_ORDER.get(rating_a, 3)  # Default to middle
-    ord_b = RATING_ORDER.get(rating_b, 3)
+    ord_a = _RATING_ORDER.get(rating_a, 3)  # Default to middle
+    ord_b = _RATING_ORDER.get(rating_b, 3)
     
     # Calculate distance (max distance is 5)
     distance = abs(ord_a - ord_b)
@@ -351,6 +779,11 @@ def calculate_seasons_similarity(tmdb_id_a, tmdb_id_b):
     if not data_a or not data_b:
         return 0.0
     
+    return _calc_seasons_from_data(data_a, data_b)
+
+
+def _calc_seasons_from_data(data_a, data_b):
+    """Seasons similarity of two already-fetched series data dicts."""
     seasons_a = data_a.get('number_of_seasons', 0)
     seasons_b = data_b.get('number_of_seasons', 0)
 
@@ -370,6 +803,23 @@ def calculate_seasons_similarity(tmdb_id_a, tmdb_id_b):
 # Weighted Similarity Calculation
 # =====================================
 
+# Fixed feature order of similarity vectors (and of the batch matrix columns)
+_FEATURE_ORDER = (
+    'genres',
+    'keywords',
+    'year_proximity',
+    'origin_country',
+    'popularity',
+    'content_rating',
+    'number_of_seasons'
+)
+
+
+def _weights_vector(weights):
+    """Weights dict -> array in _FEATURE_ORDER (missing features weigh 0)."""
+    return np.array([weights.get(feature, 0.0) for feature in _FEATURE_ORDER])
+
+
 def calculate_weighted_similarity(tmdb_id_a, tmdb_id_b, weights=None):
     """
     Calculate overall weighted similarity between two series.
@@ -385,24 +835,29 @@ def calculate_weighted_similarity(tmdb_id_a, tmdb_id_b, weights=None):
     if weights is None:
         weights = FEATURE_WEIGHTS
     
-    # Calculate individual feature similarities
-    similarities = {
-        'genres': calculate_genres_similarity(tmdb_id_a, tmdb_id_b),
-        'keywords': calculate_keywords_similarity(tmdb_id_a, tmdb_id_b),
-        'year_proximity': calculate_year_proximity(tmdb_id_a, tmdb_id_b),
-        'origin_country': calculate_origin_country_similarity(tmdb_id_a, tmdb_id_b),
-        'popularity': calculate_popularity_similarity(tmdb_id_a, tmdb_id_b),
-        'content_rating': calculate_content_rating_similarity(tmdb_id_a, tmdb_id_b),
-        'number_of_seasons': calculate_seasons_similarity(tmdb_id_a, tmdb_id_b)
-    }
+    # Fetch each series once; a series missing from the catalog has no features
+    data_a = get_series_data(tmdb_id_a)
+    data_b = get_series_data(tmdb_id_b)
+    
+    if not data_a or not data_b:
+        return 0.0
+    
+    # Calculate individual feature similarities (in _FEATURE_ORDER)
+    sim_vec = np.array([
+        calculate_genres_similarity(tmdb_id_a, tmdb_id_b),
+        calculate_keywords_similarity(tmdb_id_a, tmdb_id_b),
+        _calc_year_from_data(data_a, data_b),
+        _calc_country_from_data(data_a, data_b),
+        _calc_popularity_from_data(data_a, data_b),
+        _calc_content_rating_from_data(data_a, data_b),
+        _calc_seasons_from_data(data_a, data_b)
+    ])
     
-    # Calculate weighted sum
-    total_similarity = 0.0
-    for feature, weight in weights.items():
-        if feature in similarities:
-            total_similarity += similarities[feature] * weight
+    # Weighted sum as one dot product
+    total_similarity = float(sim_vec @ _weights_vector(weights))
     
     if DEBUG_MODE:
+        similarities = dict(zip(_FEATURE_ORDER, sim_vec.tolist()))
         print(f"[SIMILARITY] {tmdb_id_a} vs {tmdb_id_b}:")
         for feature, sim in similarities.items():
             print(f"  {feature}: {sim:.3f} (weight: {weights.get(feature, 0):.2f})")
@@ -411,29 +866,605 @@ def calculate_weighted_similarity(tmdb_id_a, tmdb_id_b, weights=None):
     return total_similarity
 
 
+# =====================================
+# Vectorized Feature Matrix
+# =====================================
+
+# Catalog-wide feature store (structure of arrays). Each series gets one row
+# the first time it is seen; later batches only gather rows by index.
+# Small integer codes keep the candidate sweep compact: ratings have six
+# levels (int8); countries get int16 since a catalog can have more than 127.
+# Missing values are encoded so the vectorized formulas reproduce the
+# per-pair functions exactly: year = NaN, log_pop = 0, seasons = 0,
+# country_idx = -1 (all mean "no similarity").
+_SOA_FIELDS = (
+    ('found', np.bool_, False),
+    ('year', np.float64, np.nan),
+    ('log_pop', np.float64, 0.0),
+    ('seasons', np.float64, 0.0),
+    ('country_idx', np.int16, -1),
+    ('rating_ord', np.int8, 3)
+)
+_SOA_INITIAL_ROWS = 1024
+_SOA_LOCK = threading.Lock()
+
+
+def _empty_soa(capacity):
+    """Feature arrays for `capacity` rows, filled with the missing-value encodings."""
+    return {name: np.full(capacity, fill, dtype=dtype) for name, dtype, fill in _SOA_FIELDS}
+
+
+def _reset_soa():
+    """Drop every stored row (called by clear_cache())."""
+    global _SOA
+    with _SOA_LOCK:
+        # Row 0 is never written: series without features map to it and,
+        # not being in 'rows', are looked up again on the next batch
+        _SOA = {'rows': {}, 'arrays': _empty_soa(_SOA_INITIAL_ROWS), 'countries': {}}
+
+
+_reset_soa()
+
+
+def _soa_append(features_by_id):
+    """Store {tmdb_id: features} of new series as rows of the SoA (caller holds _SOA_LOCK)."""
+    rows = _SOA['rows']
+    arrays = _SOA['arrays']
+    countries = _SOA['countries']
+    
+    size = len(rows) + 1
+    capacity = len(arrays['found'])
+    if size + len(features_by_id) > capacity:
+        grown = _empty_soa(max(capacity * 2, size + len(features_by_id)))
+        for name, values in arrays.items():
+            grown[name][:size] = values[:size]
+        arrays = _SOA['arrays'] = grown
+    
+    for row, (tmdb_id, features) in enumerate(features_by_id.items(), start=size):
+        rows[tmdb_id] = row
+        arrays['found'][row] = True
+        if features['year'] is not None:
+            arrays['year'][row] = features['year']
+        if features['log_pop'] is not None:
+            arrays['log_pop'][row] = features['log_pop']
+        if features['seasons']:
+            arrays['seasons'][row] = features['seasons']
+        if features['origin_country']:
+            # Countries are interned to small ints, so equality is an integer compare
+            arrays['country_idx'][row] = countries.setdefault(features['origin_country'], len(countries))
+        arrays['rating_ord'][row] = features['rating_ord']
+
+
+def _build_feature_matrix(ids):
+    """
+    Lay out the scalar features of many series as parallel NumPy arrays
+    (structure of arrays), aligned with `ids`. Features, genres and keywords
+    of uncached series are loaded with one prefetch_features() query; rows
+    already in the feature store are gathered with a single fancy index.
+    
+    Returns:
+        dict: Arrays of length len(ids):
+              'found', 'year', 'log_pop', 'seasons', 'country_idx', 'rating_ord'
+    """
+    ids = list(ids)
+    
+    # Also warms the genre/keyword caches used for the bitsets
+    prefetch_features(ids)
+    
+    with _SOA_LOCK:
+        new_ids = [tmdb_id for tmdb_id in dict.fromkeys(ids) if tmdb_id not in _SOA['rows']]
+    
+    # Read outside the lock: a series the prefetch missed is queried here
+    new_features = {tmdb_id: get_series_features(tmdb_id) for tmdb_id in new_ids}
+    
+    with _SOA_LOCK:
+        _soa_append({
+            tmdb_id: features for tmdb_id, features in new_features.items()
+            if features is not None and tmdb_id not in _SOA['rows']
+        })
+        
+        rows = np.fromiter((_SOA['rows'].get(tmdb_id, 0) for tmdb_id in ids), dtype=np.intp, count=len(ids))
+        arrays = _SOA['arrays']
+    
+    return {name: values[rows] for name, values in arrays.items()}
+
+
 # =====================================
 # Batch Operations
 # =====================================
 
-def calculate_similarities_batch(reference_id, candidate_ids, weights=None):
+def _scalar_sims(ref, cand):
+    """
+    Year, country, popularity, rating and seasons similarity of every
+    candidate to one reference, from the reference's feature row (`ref`)
+    and the candidates' feature arrays (`cand`).
+    
+    Returns:
+        np.ndarray: (N, 5) similarities, columns in _FEATURE_ORDER
+    """
+    n = len(cand['found'])
+    
+    if not ref['found']:
+        scalar_sims = np.zeros((n, 5))
+    else:
+        # Year proximity (0 when either first_air_date is missing)
+        year_diff = np.abs(cand['year'] - ref['year'])
+        year_sim = np.where(np.isnan(year_diff), 0.0,
+                            np.maximum(0.0, 1 - year_diff / DECADE_DIFF_MAX))
+        
+        # Origin country (binary)
+        if ref['country_idx'] >= 0:
+            country_sim = (cand['country_idx'] == ref['country_idx']).astype(np.float64)
+        else:
+            country_sim = np.zeros(n)
+        
+        # Popularity (log-normalized distance, 0 when either side is unknown)
+        if ref['log_pop'] > 0:
+            max_log = np.maximum(cand['log_pop'], ref['log_pop'])
+            pop_sim = np.where(cand['log_pop'] > 0,
+                               np.maximum(0.0, 1 - np.abs(cand['log_pop'] - ref['log_pop']) / max_log), 0.0)
+        else:
+            pop_sim = np.zeros(n)
+        
+        # Content rating (ordinal distance; unknown series score 0)
+        rating_sim = np.where(cand['found'],
+                              np.maximum(0.0, 1 - np.abs(cand['rating_ord'] - ref['rating_ord']) / 5.0), 0.0)
+        
+        # Number of seasons (0 when either side is unknown)
+        if ref['seasons'] > 0:
+            seasons_sim = np.where(cand['seasons'] > 0,
+                                   np.maximum(0.0, 1 - np.abs(cand['seasons'] - ref['seasons']) / SEASONS_DIFF_MAX), 0.0)
+        else:
+            seasons_sim = np.zeros(n)
+        
+        scalar_sims = np.column_stack([year_sim, country_sim, pop_sim, rating_sim, seasons_sim])
+    
+    return scalar_sims
+
+
+# Source of the compiled, fused version of _scalar_sims() @ weights for K
+# references at once: one pass over the candidates (parallel), no (N, 5)
+# temporaries. _scalar_kernel() fills in one term per scalar feature with
+# its weight (and scale) as literals, leaving out zero-weight features.
+_SCALAR_KERNEL_SOURCE = """
+def scalar_scores(ref_found, ref_year, ref_log_pop, ref_seasons, ref_country, ref_rating,
+                  cand_found, cand_year, cand_log_pop, cand_seasons, cand_country, cand_rating):
+    out = np.zeros((ref_found.shape[0], cand_found.shape[0]))
+    for i in prange(cand_found.shape[0]):
+        if not cand_found[i]:
+            continue
+        for r in range(ref_found.shape[0]):
+            if not ref_found[r]:
+                continue
+            acc = 0.0
+{terms}
+            out[r, i] = acc
+    return out
+"""
+
+# One term per scalar feature, in _FEATURE_ORDER
+_SCALAR_KERNEL_TERMS = (
+    # year_proximity
+    """
+            if not (np.isnan(ref_year[r]) or np.isnan(cand_year[i])):
+                acc += {w} * max(0.0, 1 - abs(cand_year[i] - ref_year[r]) / {year_scale})
+""",
+    # origin_country
+    """
+            if ref_country[r] >= 0 and cand_country[i] == ref_country[r]:
+                acc += {w}
+""",
+    # popularity
+    """
+            if ref_log_pop[r] > 0 and cand_log_pop[i] > 0:
+                max_log = max(cand_log_pop[i], ref_log_pop[r])
+                acc += {w} * max(0.0, 1 - abs(cand_log_pop[i] - ref_log_pop[r]) / max_log)
+""",
+    # content_rating
+    """
+            rating_diff = abs(np.float64(cand_rating[i]) - np.float64(ref_rating[r]))
+            acc += {w} * max(0.0, 1 - rating_diff / 5.0)
+""",
+    # number_of_seasons
+    """
+            if ref_seasons[r] > 0 and cand_seasons[i] > 0:
+                acc += {w} * max(0.0, 1 - abs(cand_seasons[i] - ref_seasons[r]) / {seasons_scale})
+"""
+)
+
+
+@lru_cache(maxsize=16)
+def _scalar_kernel(scalar_weights, parallel=True):
+    """
+    Compiled scalar-feature kernel specialized for one tuple of the five
+    scalar weights (in _FEATURE_ORDER). Weights are compile-time constants,
+    so zero-weight features are not in the loop at all. Compiled on first
+    use per distinct weights tuple (Numba only). With parallel=False the
+    candidate loop runs serially (no thread start-up for small batches).
+    
+    Returns:
+        callable: kernel(ref arrays x 6, cand arrays x 6) -> (K, N) weighted scalar part
+    """
+    terms = ''.join(
+        template.format(w=repr(weight), year_scale=repr(float(DECADE_DIFF_MAX)),
+                        seasons_scale=repr(float(SEASONS_DIFF_MAX)))
+        for template, weight in zip(_SCALAR_KERNEL_TERMS, scalar_weights)
+        if weight != 0.0
+    )
+    namespace = {'np': np, 'prange': prange}
+    exec(_SCALAR_KERNEL_SOURCE.format(terms=terms), namespace)
+    
+    return njit(parallel=parallel)(namespace['scalar_scores'])
+
+
+def _scalar_weights(weights_vec):
+    """Hashable key of the scalar weights for _scalar_kernel()."""
+    return tuple(float(w) for w in weights_vec[2:])
+
+
+def init_kernel_threads():
+    """
+    Configure Numba's threading for the compiled kernels. Changes
+    process-wide Numba state, so it is called by the entry points (app,
+    benchmark) rather than on import, before any parallel kernel runs.
+    
+    Asks for a thread-safe threading layer (TBB / OpenMP) unless one was
+    chosen via NUMBA_THREADING_LAYER, falling back to workqueue when neither
+    is installed, and runs the kernels on SIMILARITY_WORKERS threads
+    (bounded by Numba's pool size). Parallel kernel calls stay serialized
+    unless the resulting layer is thread-safe. No-op without Numba.
+    
+    Returns:
+        str: The threading layer in use (None without Numba)
+    """
+    global _PARALLEL_LOCK
+    if njit is None:
+        return None
+    
+    num_threads = max(1, min(SIMILARITY_WORKERS, numba.config.NUMBA_NUM_THREADS))
+    if 'NUMBA_THREADING_LAYER' not in os.environ:
+        numba.config.THREADING_LAYER = 'threadsafe'
+    try:
+        numba.set_num_threads(num_threads)
+    except ValueError:  # no TBB / OpenMP installed
+        numba.config.THREADING_LAYER = 'workqueue'
+        numba.set_num_threads(num_threads)
+    
+    layer = numba.threading_layer()
+    if layer != 'workqueue':
+        _PARALLEL_LOCK = nullcontext()
+    return layer
+
+
+def warm_up_kernels():
+    """
+    Compile (or load from Numba's on-disk cache) the compiled kernels now,
+    with the exact argument types the batch functions use, so the first
+    real request does not pay the JIT delay. The scalar kernel is compiled
+    for the default FEATURE_WEIGHTS. No-op without Numba.
+    
+    Call once at startup, after init_kernel_threads().
+    
+    Returns:
+        bool: True if kernels were warmed up
+    """
+    if njit is None:
+        return False
+    
+    feature_rows = [np.zeros(1, dtype=dtype) for _, dtype, _ in _SOA_FIELDS]
+    with _PARALLEL_LOCK:
+        _jaccard_batch_numba(np.zeros((1, 1), dtype=np.uint64), np.zeros(1, dtype=np.uint64))
+        for parallel in (True, False):
+            _scalar_kernel(_scalar_weights(_weights_vector(FEATURE_WEIGHTS)), parallel)(*feature_rows, *feature_rows)
+    
+    return True
+
+
+def _set_sims(reference_id, cand_genre_bits, cand_keyword_bits):
+    """
+    Genre and keyword Jaccard of every candidate to one reference
+    (popcount over the candidates' stacked (N, W) bitsets).
+    
+    Returns:
+        np.ndarray: (N, 2) similarities, columns in _FEATURE_ORDER
+    """
+    genre_sim = jaccard_bitset_batch(cand_genre_bits, get_series_genre_bits(reference_id))
+    keyword_sim = jaccard_bitset_batch(cand_keyword_bits, get_series_keyword_bits(reference_id))
+    
+    return np.column_stack([genre_sim, keyword_sim])
+
+
+def top_n_indices(scores, top_n=None):
+    """
+    Indices of the top_n highest scores, best first, in O(N) with
+    np.argpartition (a full sort only without top_n). Ties keep their input
+    order, exactly like a stable sort by descending score.
+    
+    Args:
+        scores: 1-D array of scores
+        top_n: Number of indices to return (optional, None = all)
+    
+    Returns:
+        np.ndarray: Indices into scores
+    """
+    scores = np.asarray(scores)
+    n = len(scores)
+    
+    if not top_n or top_n >= n:
+        return np.argsort(-scores, kind='stable')
+    
+    # Everything above the top_n-th best score, then the earliest ties with it
+    kth = scores[np.argpartition(-scores, top_n - 1)[top_n - 1]]
+    above = np.flatnonzero(scores > kth)
+    ties = np.flatnonzero(scores == kth)[:top_n - len(above)]
+    selected = np.concatenate([above, ties])
+    
+    return selected[np.lexsort((selected, -scores[selected]))]
+
+
+def calculate_similarities_batch(reference_id, candidate_ids, weights=None, top_n=None):
     """
     Calculate similarities between one reference series and multiple candidates.
     
+    All scalar features are computed for every candidate at once with NumPy
+    array expressions, and the weighted total is a single matrix-vector product.
+    
+    With top_n, only the best top_n candidates are returned. Genre and keyword
+    similarity (the heaviest weights) are scored first; their weighted sum is
+    a lower bound on each total, so candidates that cannot reach the top_n-th
+    best lower bound even with perfect remaining features are dropped before
+    the scalar features are computed.
+    
     Args:
         reference_id: Reference series ID
         candidate_ids: List of candidate series IDs
         weights: Custom weights dict (optional)
+        top_n: Return only the top N, sorted by score descending (optional)
     
     Returns:
         list: List of tuples (candidate_id, similarity_score)
     """
-    results = []
+    if weights is None:
+        weights = FEATURE_WEIGHTS
     
-    for candidate_id in candidate_ids:
-        if candidate_id == reference_id:
-            continue  # Skip self-comparison
-        
-        similarity = calculate_weighted_similarity(reference_id, candidate_id, weights)
-        results.append((candidate_id, similarity))
+    ids = [cid for cid in candidate_ids if cid != reference_id]  # Skip self-comparison
+    if not ids:
+        return []
+    
+    if not top_n or top_n >= len(ids):
+        scores = calculate_similarity_matrix([reference_id], ids, weights)[0]
+        if not top_n:
+            return list(zip(ids, scores.tolist()))
+        return [(ids[i], scores[i].item()) for i in top_n_indices(scores)]
+    
+    # Row 0 is the reference, rows 1.. are the candidates
+    features = _build_feature_matrix([reference_id] + ids)
+    ref = {name: values[0] for name, values in features.items()}
+    cand = {name: values[1:] for name, values in features.items()}
+    weights_vec = _weights_vector(weights)
+    
+    set_sims = _set_sims(
+        reference_id,
+        _stack_bits([get_series_genre_bits(cid) for cid in ids]),
+        _stack_bits([get_series_keyword_bits(cid) for cid in ids])
+    )
+    
+    # The set-feature partial score bounds each total from below (other sims >= 0);
+    # keep a candidate only if its best possible total reaches the top_n-th partial
+    partial = set_sims @ weights_vec[:2]
+    kth_partial = np.partition(partial, len(ids) - top_n)[len(ids) - top_n]
+    keep = np.flatnonzero(partial + weights_vec[2:].sum() >= kth_partial)
+    
+    kept_cand = {name: values[keep] for name, values in cand.items()}
+    F = np.column_stack([set_sims[keep], _scalar_sims(ref, kept_cand)])
+    scores = F @ weights_vec
+    
+    # O(N) selection, same order as a full stable sort
+    return [(ids[keep[i]], scores[i].item()) for i in top_n_indices(scores, top_n)]
+
+
+def calculate_similarity_matrix(reference_ids, candidate_ids, weights=None, min_score=None):
+    """
+    Calculate similarities between several reference series and the same
+    candidates. The candidate features and bitsets are built once and
+    reused for every reference.
+    
+    Unlike calculate_similarities_batch(), a candidate equal to a reference
+    is not skipped - callers exclude it when needed.
+    
+    With min_score (e.g. an exclusion threshold), genre and keyword similarity
+    are scored first; a candidate whose score cannot reach min_score for any
+    reference even with perfect remaining features gets -inf, and its scalar
+    features are never computed.
+    
+    Args:
+        reference_ids: List of reference series IDs (K)
+        candidate_ids: List of candidate series IDs (N)
+        weights: Custom weights dict (optional)
+        min_score: Only scores >= min_score need to be exact (optional)
+    
+    Returns:
+        np.ndarray: (K, N) matrix, row k = similarities to reference_ids[k]
+    """
+    if weights is None:
+        weights = FEATURE_WEIGHTS
+    
+    refs = list(reference_ids)
+    ids = list(candidate_ids)
+    k = len(refs)
+    
+    if not refs or not ids:
+        return np.zeros((k, len(ids)))
+    
+    # Rows 0..K-1 are the references, rows K.. are the candidates
+    # (also warms the genre/keyword caches used for the bitsets below)
+    features = _build_feature_matrix(refs + ids)
+    cand_genre_bits = _stack_bits([get_series_genre_bits(cid) for cid in ids])
+    cand_keyword_bits = _stack_bits([get_series_keyword_bits(cid) for cid in ids])
+    weights_vec = _weights_vector(weights)
+    
+    # Weighted genre + keyword part, for every pair
+    set_part = np.empty((k, len(ids)))
+    for row, reference_id in enumerate(refs):
+        set_part[row] = _set_sims(reference_id, cand_genre_bits, cand_keyword_bits) @ weights_vec[:2]
+    
+    if min_score is None:
+        cols = np.arange(len(ids))
+        matrix = set_part
+    else:
+        # Scalar similarities are at most 1, so this bounds each total from above
+        reachable = set_part + weights_vec[2:].sum() >= min_score
+        cols = np.flatnonzero(reachable.any(axis=0))
+        matrix = np.full((k, len(ids)), -np.inf)
+        matrix[:, cols] = set_part[:, cols]
+    
+    if not cols.size:
+        return matrix
+    
+    cand = {name: values[k:][cols] for name, values in features.items()}
+    
+    if njit is not None:
+        # Compiled path: all scalar features for all references in one fused kernel,
+        # parallel over candidates unless the batch is too small to amortize the threads
+        names = ('found', 'year', 'log_pop', 'seasons', 'country_idx', 'rating_ord')
+        parallel = cols.size >= COMPILED_PARALLEL_MIN_CANDIDATES
+        with _PARALLEL_LOCK if parallel else nullcontext():
+            matrix[:, cols] += _scalar_kernel(_scalar_weights(weights_vec), parallel)(
+                *[features[name][:k] for name in names],
+                *[cand[name] for name in names]
+            )
+        return matrix
+    
+    scalar_part = np.empty((k, cols.size))
+    ref_rows = [{name: values[row] for name, values in features.items()} for row in range(k)]
+    
+    def score_chunk(start, stop):
+        # Each chunk fills its own columns, so chunks never overlap
+        chunk = {name: values[start:stop] for name, values in cand.items()}
+        for row in range(k):
+            scalar_part[row, start:stop] = _scalar_sims(ref_rows[row], chunk) @ weights_vec[2:]
+    
+    # Large batches are split into one candidate chunk per worker thread
+    # (the Numba path above already runs on all cores)
+    workers = min(SIMILARITY_WORKERS, cols.size // PARALLEL_MIN_CANDIDATES)
+    if workers <= 1:
+        score_chunk(0, cols.size)
+    else:
+        bounds = np.linspace(0, cols.size, workers + 1).astype(int)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for future in [executor.submit(score_chunk, start, stop)
+                           for start, stop in zip(bounds[:-1], bounds[1:])]:
+                future.result()
+    
+    matrix[:, cols] += scalar_part
+    
+    return matrix
+
+
+# =====================================
+# Profile Scoring
+# =====================================
+
+def _proximity_lookup(ref_values, ref_weights, cand_values, cand_valid, scale):
+    """
+    sum_r ref_weights[r] * max(0, 1 - |cand - ref_values[r]| / scale) for an
+    integer-valued feature. The sum is tabulated once per value in the
+    candidates' range (years, seasons, rating levels: a few dozen entries)
+    and gathered for every valid candidate; invalid candidates score 0.
+    
+    Returns:
+        np.ndarray: (N,) weighted proximity sums
+    """
+    out = np.zeros(len(cand_values))
+    if not ref_values.size or not cand_valid.any():
+        return out
+    
+    values = cand_values[cand_valid].astype(np.int64)
+    low = values.min()
+    table_values = np.arange(low, values.max() + 1, dtype=np.float64)
+    table = np.maximum(0.0, 1 - np.abs(table_values[:, None] - ref_values[None, :]) / scale) @ ref_weights
+    out[cand_valid] = table[values - low]
+    
+    return out
+
+
+def calculate_profile_scores(reference_ids, reference_weights, candidate_ids, weights=None):
+    """
+    Weighted sum of each candidate's similarities to a set of reference
+    series (e.g. a user's liked series, anchors weighted 2):
+    score[c] = sum_r reference_weights[r] * similarity(r, c).
+    
+    Similarity is not an inner product of feature vectors, so the references
+    cannot be averaged into a single profile vector. The sum does split per
+    feature, though: year, country, rating and seasons similarity depend only
+    on a small integer value of the candidate, so the profile's total for
+    each value is tabulated once and looked up per candidate. Only genre and
+    keyword Jaccard and popularity are computed per (reference, candidate) pair.
+    
+    Args:
+        reference_ids: List of reference series IDs (K)
+        reference_weights: Weight of each reference (K)
+        candidate_ids: List of candidate series IDs (N)
+        weights: Custom weights dict (optional)
+    
+    Returns:
+        np.ndarray: (N,) weighted similarity sums
+    """
+    if weights is None:
+        weights = FEATURE_WEIGHTS
+    
+    refs = list(reference_ids)
+    ids = list(candidate_ids)
+    k = len(refs)
+    
+    if not refs or not ids:
+        return np.zeros(len(ids))
+    
+    ref_weights = np.asarray(reference_weights, dtype=np.float64)
+    features = _build_feature_matrix(refs + ids)
+    ref = {name: values[:k] for name, values in features.items()}
+    cand = {name: values[k:] for name, values in features.items()}
+    cand_genre_bits = _stack_bits([get_series_genre_bits(cid) for cid in ids])
+    cand_keyword_bits = _stack_bits([get_series_keyword_bits(cid) for cid in ids])
+    weights_vec = _weights_vector(weights)
+    
+    # Genre + keyword Jaccard, per pair
+    set_part = np.empty((k, len(ids)))
+    for row, reference_id in enumerate(refs):
+        set_part[row] = _set_sims(reference_id, cand_genre_bits, cand_keyword_bits) @ weights_vec[:2]
+    scores = ref_weights @ set_part
+    
+    # Missing values use the feature store encodings, so the masks below
+    # match _scalar_sims() (an unknown series has no year, country or seasons)
+    has_year = ~np.isnan(ref['year'])
+    year_sum = _proximity_lookup(ref['year'][has_year], ref_weights[has_year],
+                                 cand['year'], ~np.isnan(cand['year']), DECADE_DIFF_MAX)
+    
+    # Only candidates with a country are looked up (with no country anywhere
+    # the table is empty, so no index into it may be evaluated)
+    has_country = ref['country_idx'] >= 0
+    cand_has_country = cand['country_idx'] >= 0
+    country_table = np.bincount(
+        ref['country_idx'][has_country].astype(np.intp), weights=ref_weights[has_country],
+        minlength=int(max(ref['country_idx'].max(), cand['country_idx'].max())) + 1
+    )
+    country_sum = np.zeros(len(ids))
+    country_sum[cand_has_country] = country_table[cand['country_idx'][cand_has_country].astype(np.intp)]
+    
+    pop_sum = np.zeros(len(ids))
+    for ref_log_pop, ref_weight in zip(ref['log_pop'], ref_weights):
+        if ref_log_pop > 0:
+            max_log = np.maximum(cand['log_pop'], ref_log_pop)
+            pop_sum += ref_weight * np.where(
+                cand['log_pop'] > 0, np.maximum(0.0, 1 - np.abs(cand['log_pop'] - ref_log_pop) / max_log), 0.0)
+    
+    rating_sum = _proximity_lookup(ref['rating_ord'][ref['found']].astype(np.float64), ref_weights[ref['found']],
+                                   cand['rating_ord'], cand['found'], 5.0)
+    
+    has_seasons = ref['seasons'] > 0
+    seasons_sum = _proximity_lookup(ref['seasons'][has_seasons], ref_weights[has_seasons],
+                                    cand['seasons'], cand['seasons'] > 0, SEASONS_DIFF_MAX)
+    
+    scalar_sums = np.column_stack([year_sum, country_sum, pop_sum, rating_sum, seasons_sum])
     
-    return results
+    return scores + scalar_sums @ weights_vec[2:]
@@ -5,20 +5,11 @@ Pre-filters the series catalog based on user preferences.
 Reduces the candidate pool from thousands to hundreds before similarity calculation.
 """
 
-import sys
-import os
+import functools
 
-# Add parent directory to path
-current_dir = os.path.dirname(os.path.abspath(__file__))
-parent_dir = os.path.dirname(current_dir)
-sys.path.insert(0, parent_dir)
+from src.data_layer.db_utils import fetch_query
 
-from data_layer.db_utils import fetch_query
-
-try:
-    from .config import DEBUG_MODE, MAX_CANDIDATES
-except ImportError:
-    from config import DEBUG_MODE, MAX_CANDIDATES
+from src.logic_layer.config import DEBUG_MODE, MAX_CANDIDATES
 
 
 def apply_filters(filters_dict):
@@ -63,11 +54,12 @@ def apply_filters(filters_dict):
         decade_conditions = []
         for decade in filters_dict['decades']:
             # Series is in decade if it started OR ended in that decade OR was running during it
+            # first_year/last_year are generated columns (see schema_migrations.sql)
             decade_conditions.append(
-                f"""(
-                    (EXTRACT(YEAR FROM s.first_air_date) >= %s AND EXTRACT(YEAR FROM s.first_air_date) < %s) OR
-                    (s.last_air_date IS NOT NULL AND EXTRACT(YEAR FROM s.last_air_date) >= %s AND EXTRACT(YEAR FROM s.last_air_date) < %s) OR
-                    (EXTRACT(YEAR FROM s.first_air_date) < %s AND (s.last_air_date IS NULL OR EXTRACT(YEAR FROM s.last_air_date) >= %s))
+                """(
+                    (s.first_year >= %s AND s.first_year < %s) OR
+                    (s.last_year >= %s AND s.last_year < %s) OR
+                    (s.first_year < %s AND (s.last_year IS NULL OR s.last_year >= %s))
                 )"""
             )
             params.extend([decade, decade + 10, decade, decade + 10, decade + 10, decade])
@@ -105,110 +97,17 @@ def apply_filters(filters_dict):
     return candidate_ids
 
 
-def filter_by_language(language_list):
-    """
-    Filter series by original language.
-
-    Args:
-        language_list (list): List of language codes (e.g., ['en', 'ko'])
-
-    Returns:
-        list: List of tmdb_ids
-    """
-    if not language_list:
-        return []
-
-    placeholders = ','.join(['%s'] * len(language_list))
-    query = f"SELECT tmdb_id FROM series WHERE original_language IN ({placeholders})"
-    results = fetch_query(query, tuple(language_list))
-
-    return [row[0] for row in results]
-
-
-def filter_by_status(status_list):
-    """
-    Filter series by status (Running/Ended).
-
-    Args:
-        status_list (list): List of statuses (e.g., ['Running', 'Ended'])
-
-    Returns:
-        list: List of tmdb_ids
-    """
-    if not language_list:
-        return []
-
-    placeholders = ','.join(['%s'] * len(status_list))
-    query = f"SELECT tmdb_id FROM series WHERE status IN ({placeholders})"
-    results = fetch_query(query, tuple(status_list))
-
-    return [row[0] for row in results]
-
-
-def filter_by_decades(decades_list):
-    """
-    Filter series by release decades - considers both start and end dates.
-
-    Args:
-        decades_list (list): List of decades (e.g., [2000, 2010, 2020])
-
-    Returns:
-        list: List of tmdb_ids
-    """
-    if not decades_list:
-        return []
-
-    conditions = []
-    params = []
-
-    for decade in decades_list:
-        conditions.append(
-            """(
-                (EXTRACT(YEAR FROM first_air_date) >= %s AND EXTRACT(YEAR FROM first_air_date) < %s) OR
-                (last_air_date IS NOT NULL AND EXTRACT(YEAR FROM last_air_date) >= %s AND EXTRACT(YEAR FROM last_air_date) < %s) OR
-                (EXTRACT(YEAR FROM first_air_date) < %s AND (last_air_date IS NULL OR EXTRACT(YEAR FROM last_air_date) >= %s))
-            )"""
-        )
-        params.extend([decade, decade + 10, decade, decade + 10, decade + 10, decade])
-
-    query = f"SELECT tmdb_id FROM series WHERE {' OR '.join(conditions)}"
-    results = fetch_query(query, tuple(params))
-
-    return [row[0] for row in results]
-
-
-def filter_by_genres(genres_list):
-    """
-    Filter series by genres (OR logic - at least one genre match).
-
-    Args:
-        genres_list (list): List of genre_ids (e.g., [18, 80])
-
-    Returns:
-        list: List of tmdb_ids
-    """
-    if not genres_list:
-        return []
-
-    placeholders = ','.join(['%s'] * len(genres_list))
-    query = f"""
-        SELECT DISTINCT tmdb_id 
-        FROM series_genres 
-        WHERE genre_id IN ({placeholders})
-    """
-    results = fetch_query(query, tuple(genres_list))
-
-    return [row[0] for row in results]
-
-
+@functools.lru_cache(maxsize=1)
 def get_all_series_ids():
     """
     Get all series IDs from database (no filtering).
+    The result is cached for the life of the process; call
+    get_all_series_ids.cache_clear() after the catalog changes.
 
     Returns:
-        list: List of all tmdb_ids
+        tuple: All tmdb_ids (immutable, since it is shared between callers)
     """
     query = f"SELECT tmdb_id FROM series LIMIT {MAX_CANDIDATES}"
     results = fetch_query(query)
 
-    return [row[0] for row in results]
\ No newline at end of file
+    return tuple(row[0] for row in results)
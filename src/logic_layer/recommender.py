@@ -5,27 +5,19 @@ This is the main entry point for the recommendation system.
 UI/API layer should call get_recommendations() from this module.
 """
 
-import sys
-import os
+import time
+from collections import defaultdict
+from functools import lru_cache
 
-# Add parent directory to path for imports
-current_dir = os.path.dirname(os.path.abspath(__file__))
-parent_dir = os.path.dirname(current_dir)
-sys.path.insert(0, parent_dir)
+from src.data_layer.db_utils import fetch_query, fetch_prepared, fetch_dicts
 
-from data_layer.db_utils import fetch_query
-
-# Try relative imports first, fall back to absolute
-try:
-    from .filters import apply_filters
-    from .similarity_engine import get_recommendations as calc_recommendations
-    from .feature_builder import get_series_data, clear_cache
-    from .config import TOP_N_DEFAULT, DEBUG_MODE, GENRE_ID_TO_NAME
-except ImportError:
-    from filters import apply_filters
-    from similarity_engine import get_recommendations as calc_recommendations
-    from feature_builder import get_series_data, clear_cache
-    from config import TOP_N_DEFAULT, DEBUG_MODE, GENRE_ID_TO_NAME
+from src.logic_layer.filters import apply_filters
+from src.logic_layer.similarity_engine import get_recommendations as calc_recommendations
+from src.logic_layer.feature_builder import get_series_data, prefetch_series, clear_cache
+from src.logic_layer.config import (
+    TOP_N_DEFAULT, DEBUG_MODE, GENRE_ID_TO_NAME, FEATURE_CACHE_SIZE,
+    STATS_CACHE_TTL, SEARCH_CACHE_TTL, SEARCH_CACHE_SIZE
+)
 
 
 # =====================================
@@ -43,6 +35,8 @@ def get_recommendations(user_ratings, filters=None, top_n=None, weights=None):
                      Format: [(tmdb_id, rating, is_anchor), ...]
                      - rating: 1 (like), -1 (dislike)
                      - is_anchor: True/False (optional, defaults to False)
+                     A NumPy structured array with 'tmdb_id', 'rating'
+                     (and optionally 'is_anchor') fields is also accepted.
                      
         filters: Dict of filter criteria (all optional, None = no filter)
                 {
@@ -167,6 +161,11 @@ def enrich_recommendations(scored_results):
         list: List of enriched recommendation dicts
     """
     recommendations = []
+    ids = [tmdb_id for tmdb_id, _ in scored_results]
+    
+    # Load every recommended series (incl. Hebrew title) and its genre names with one query each
+    prefetch_series(ids)
+    genres_by_id = get_genre_names_by_id(ids)
     
     for tmdb_id, score in scored_results:
         # Get series data
@@ -175,17 +174,11 @@ def enrich_recommendations(scored_results):
         if not series_data:
             continue
         
-        # Get genres
-        genres = get_series_genres_names(tmdb_id)
-        
-        # Get Hebrew title
-        title_he = get_hebrew_title(tmdb_id)
-        
         # Build recommendation dict
         rec = {
             'tmdb_id': tmdb_id,
             'title_en': series_data.get('title_en', 'Unknown'),
-            'title_he': title_he,
+            'title_he': series_data.get('title_he') or None,
             'score': round(score, 3),
             'poster_path': series_data.get('poster_path'),
             'overview': series_data.get('overview'),
@@ -196,7 +189,7 @@ def enrich_recommendations(scored_results):
             'number_of_seasons': series_data.get('number_of_seasons'),
             'number_of_episodes': series_data.get('number_of_episodes'),
             'content_rating': series_data.get('content_rating'),
-            'genres': genres
+            'genres': genres_by_id.get(tmdb_id, [])
         }
         
         recommendations.append(rec)
@@ -204,9 +197,30 @@ def enrich_recommendations(scored_results):
     return recommendations
 
 
+@lru_cache(maxsize=FEATURE_CACHE_SIZE)
+def _get_genre_names(tmdb_id):
+    """
+    Get genre names of a series (one cache entry per series).
+    
+    Returns:
+        tuple: Genre names
+    """
+    query = """
+        SELECT g.genre_name
+        FROM series_genres sg
+        JOIN genres g ON sg.genre_id = g.genre_id
+        WHERE sg.tmdb_id = $1
+    """
+    
+    results = fetch_prepared('series_genre_names', query, (tmdb_id,))
+    
+    return tuple(row[0] for row in results)
+
+
 def get_series_genres_names(tmdb_id):
     """
     Get genre names for a series.
+    Uses caching.
     
     Args:
         tmdb_id: Series ID
@@ -214,16 +228,31 @@ def get_series_genres_names(tmdb_id):
     Returns:
         list: List of genre names (e.g., ['Drama', 'Crime'])
     """
+    return list(_get_genre_names(tmdb_id))
+
+
+def get_genre_names_by_id(tmdb_ids):
+    """
+    Get genre names for many series with a single query.
+    
+    Args:
+        tmdb_ids: List of series IDs
+    
+    Returns:
+        dict: {tmdb_id: [genre names]} (series without genres are omitted)
+    """
     query = """
-        SELECT g.genre_name
+        SELECT sg.tmdb_id, g.genre_name
         FROM series_genres sg
         JOIN genres g ON sg.genre_id = g.genre_id
-        WHERE sg.tmdb_id = %s
+        WHERE sg.tmdb_id = ANY(%s)
     """
     
-    results = fetch_query(query, (tmdb_id,))
+    names_by_id = defaultdict(list)
+    for tmdb_id, genre_name in fetch_query(query, (list(tmdb_ids),)):
+        names_by_id[tmdb_id].append(genre_name)
     
-    return [row[0] for row in results]
+    return dict(names_by_id)
 
 
 def get_hebrew_title(tmdb_id):
@@ -236,11 +265,11 @@ def get_hebrew_title(tmdb_id):
     Returns:
         str: Hebrew title or None
     """
-    query = "SELECT title_he FROM series WHERE tmdb_id = %s"
-    result = fetch_query(query, (tmdb_id,))
+    # Served from the cached series row
+    series_data = get_series_data(tmdb_id)
     
-    if result and result[0][0]:
-        return result[0][0]
+    if series_data and series_data.get('title_he'):
+        return series_data['title_he']
     
     return None
 
@@ -265,7 +294,7 @@ def get_series_details(tmdb_id):
         return None
     
     genres = get_series_genres_names(tmdb_id)
-    title_he = get_hebrew_title(tmdb_id)
+    title_he = series_data.get('title_he') or None
     
     return {
         'tmdb_id': tmdb_id,
@@ -287,9 +316,17 @@ def get_series_details(tmdb_id):
     }
 
 
+# Shortest query pg_trgm can index (one trigram); shorter ones use a prefix match
+_TRIGRAM_MIN_QUERY = 3
+
+# (query, limit) -> (expires_at, results); insertion-ordered, oldest evicted first
+_search_cache = {}
+
+
 def search_series(query, limit=10):
     """
     Search for series by title (for rating selection UI).
+    Queries shorter than 3 characters match title prefixes only.
     
     Args:
         query: Search query string
@@ -298,26 +335,42 @@ def search_series(query, limit=10):
     Returns:
         list: List of series dicts matching the query
     """
-    sql = """
-        SELECT tmdb_id, title_en, title_he, first_air_date, poster_path
-        FROM series
-        WHERE LOWER(title_en) LIKE LOWER(%s) OR LOWER(title_he) LIKE LOWER(%s)
-        ORDER BY popularity DESC
-        LIMIT %s
-    """
+    # The UI searches on every keystroke - reuse recent results for SEARCH_CACHE_TTL seconds
+    key = (query, limit)
+    now = time.monotonic()
+    cached = _search_cache.get(key)
+    if cached is not None and now < cached[0]:
+        return [dict(series) for series in cached[1]]
+    
+    if len(query) >= _TRIGRAM_MIN_QUERY:
+        # Substring match, served by the pg_trgm GIN indexes
+        sql = """
+            SELECT tmdb_id, title_en, title_he, to_char(first_air_date, 'YYYY-MM-DD') AS first_air_date, poster_path
+            FROM series
+            WHERE title_en ILIKE %s OR title_he ILIKE %s
+            ORDER BY popularity DESC
+            LIMIT %s
+        """
+        search_pattern = f'%{query}%'
+    else:
+        # Too short for trigrams - prefix match on the LOWER(title) btree indexes
+        sql = """
+            SELECT tmdb_id, title_en, title_he, to_char(first_air_date, 'YYYY-MM-DD') AS first_air_date, poster_path
+            FROM series
+            WHERE LOWER(title_en) LIKE LOWER(%s) OR LOWER(title_he) LIKE LOWER(%s)
+            ORDER BY popularity DESC
+            LIMIT %s
+        """
+        search_pattern = f'{query}%'
     
-    search_pattern = f'%{query}%'
-    results = fetch_query(sql, (search_pattern, search_pattern, limit))
+    # Rows come back as dicts keyed by the selected column names
+    series_list = fetch_dicts(sql, (search_pattern, search_pattern, limit))
     
-    series_list = []
-    for row in results:
-        series_list.append({
-            'tmdb_id': row[0],
-            'title_en': row[1],
-            'title_he': row[2],
-            'first_air_date': str(row[3]) if row[3] else None,
-            'poster_path': row[4]
-        })
+    if series_list:
+        _search_cache.pop(key, None)
+        if len(_search_cache) >= SEARCH_CACHE_SIZE:
+            _search_cache.pop(next(iter(_search_cache), None), None)
+        _search_cache[key] = (now + SEARCH_CACHE_TTL, [dict(series) for series in series_list])
     
     return series_list
 
@@ -335,34 +388,21 @@ def get_popular_series(limit=20, language=None):
     """
     if language:
         sql = """
-            SELECT tmdb_id, title_en, title_he, first_air_date, poster_path, popularity
+            SELECT tmdb_id, title_en, title_he, to_char(first_air_date, 'YYYY-MM-DD') AS first_air_date, poster_path, popularity
             FROM series
             WHERE original_language = %s
             ORDER BY popularity DESC
             LIMIT %s
         """
-        results = fetch_query(sql, (language, limit))
+        return fetch_dicts(sql, (language, limit))
     else:
         sql = """
-            SELECT tmdb_id, title_en, title_he, first_air_date, poster_path, popularity
+            SELECT tmdb_id, title_en, title_he, to_char(first_air_date, 'YYYY-MM-DD') AS first_air_date, poster_path, popularity
             FROM series
             ORDER BY popularity DESC
             LIMIT %s
         """
-        results = fetch_query(sql, (limit,))
-    
-    series_list = []
-    for row in results:
-        series_list.append({
-            'tmdb_id': row[0],
-            'title_en': row[1],
-            'title_he': row[2],
-            'first_air_date': str(row[3]) if row[3] else None,
-            'poster_path': row[4],
-            'popularity': row[5]
-        })
-    
-    return series_list
+        return fetch_dicts(sql, (limit,))
 
 
 def reset_cache():
@@ -370,6 +410,9 @@ def reset_cache():
     Clear all caches (useful between sessions or for testing).
     """
     clear_cache()
+    _get_genre_names.cache_clear()
+    _search_cache.clear()
+    _stats_cache['value'] = None
     if DEBUG_MODE:
         print("[CACHE] All caches cleared")
 
@@ -378,6 +421,54 @@ def reset_cache():
 # Statistics & Analysis
 # =====================================
 
+# All stats in one round-trip. Each breakdown is returned as a JSON array of
+# [key, count] pairs (not a JSON object) to keep integer decades, NULL keys
+# and the ORDER BY of every breakdown.
+_STATS_SQL = """
+    WITH t AS (
+        SELECT COUNT(*) AS c FROM series
+    ),
+    lang AS (
+        SELECT json_agg(json_build_array(original_language, c) ORDER BY c DESC) AS j
+        FROM (SELECT original_language, COUNT(*) AS c FROM series GROUP BY 1) s
+    ),
+    stat AS (
+        SELECT json_agg(json_build_array(status, c)) AS j
+        FROM (SELECT status, COUNT(*) AS c FROM series GROUP BY 1) s
+    ),
+    dec AS (
+        SELECT json_agg(json_build_array(decade, c) ORDER BY decade DESC) AS j
+        FROM (
+            SELECT (EXTRACT(YEAR FROM first_air_date)::int / 10) * 10 AS decade, COUNT(*) AS c
+            FROM series
+            WHERE first_air_date IS NOT NULL
+            GROUP BY 1
+        ) s
+    ),
+    gen AS (
+        SELECT json_agg(json_build_array(genre_name, c) ORDER BY c DESC) AS j
+        FROM (
+            SELECT g.genre_name, COUNT(*) AS c
+            FROM series_genres sg
+            JOIN genres g ON sg.genre_id = g.genre_id
+            GROUP BY g.genre_name
+            ORDER BY c DESC
+            LIMIT 10
+        ) s
+    )
+    SELECT t.c, lang.j, stat.j, dec.j, gen.j
+    FROM t, lang, stat, dec, gen
+"""
+
+# Stats change only when the ETL runs, so they are reused for STATS_CACHE_TTL seconds
+_stats_cache = {'value': None, 'expires': 0.0}
+
+
+def _copy_stats(stats):
+    """Copy of a stats dict (and its per-key count dicts), so callers never share the cached one."""
+    return {key: dict(value) if isinstance(value, dict) else value for key, value in stats.items()}
+
+
 def get_recommendation_stats():
     """
     Get statistics about the recommendation system.
@@ -385,50 +476,30 @@ def get_recommendation_stats():
     Returns:
         dict: Statistics about the database and system
     """
-    stats = {}
-    
-    # Total series
-    result = fetch_query("SELECT COUNT(*) FROM series")
-    stats['total_series'] = result[0][0] if result else 0
-    
-    # Series by language
-    result = fetch_query("""
-        SELECT original_language, COUNT(*) 
-        FROM series 
-        GROUP BY original_language 
-        ORDER BY COUNT(*) DESC
-    """)
-    stats['by_language'] = {row[0]: row[1] for row in result} if result else {}
-    
-    # Series by status
-    result = fetch_query("""
-        SELECT status, COUNT(*) 
-        FROM series 
-        GROUP BY status
-    """)
-    stats['by_status'] = {row[0]: row[1] for row in result} if result else {}
-    
-    # Series by decade
-    result = fetch_query("""
-        SELECT 
-            (EXTRACT(YEAR FROM first_air_date)::int / 10) * 10 as decade,
-            COUNT(*)
-        FROM series
-        WHERE first_air_date IS NOT NULL
-        GROUP BY decade
-        ORDER BY decade DESC
-    """)
-    stats['by_decade'] = {row[0]: row[1] for row in result} if result else {}
-    
-    # Top genres
-    result = fetch_query("""
-        SELECT g.genre_name, COUNT(*) as cnt
-        FROM series_genres sg
-        JOIN genres g ON sg.genre_id = g.genre_id
-        GROUP BY g.genre_name
-        ORDER BY cnt DESC
-        LIMIT 10
-    """)
-    stats['top_genres'] = {row[0]: row[1] for row in result} if result else {}
+    now = time.monotonic()
+    if _stats_cache['value'] is not None and now < _stats_cache['expires']:
+        return _copy_stats(_stats_cache['value'])
+    
+    result = fetch_query(_STATS_SQL)
+    if not result:
+        # Query failed - don't cache the empty result
+        return {
+            'total_series': 0,
+            'by_language': {},
+            'by_status': {},
+            'by_decade': {},
+            'top_genres': {}
+        }
+    
+    total, by_language, by_status, by_decade, top_genres = result[0]
+    stats = {
+        'total_series': total or 0,
+        'by_language': {key: count for key, count in by_language or []},
+        'by_status': {key: count for key, count in by_status or []},
+        'by_decade': {key: count for key, count in by_decade or []},
+        'top_genres': {key: count for key, count in top_genres or []}
+    }
     
-    return stats
+    _stats_cache['value'] = stats
+    _stats_cache['expires'] = now + STATS_CACHE_TTL
+    return _copy_stats(stats)
@@ -5,50 +5,54 @@ Builds user profiles from ratings and calculates recommendations.
 Handles like/dislike logic and exclusion filtering.
 """
 
-import sys
-import os
+from collections import Counter
 
-# Add parent directory to path
-current_dir = os.path.dirname(os.path.abspath(__file__))
-parent_dir = os.path.dirname(current_dir)
-sys.path.insert(0, parent_dir)
+import numpy as np
 
-try:
-    from .feature_builder import (
-        calculate_weighted_similarity,
-        calculate_similarities_batch,
-        get_series_data
-    )
-    from .config import (
-        RATING_LIKE,
-        RATING_DISLIKE,
-        ANCHOR_MULTIPLIER,
-        DISLIKE_EXCLUSION_THRESHOLD,
-        MIN_LIKES,
-        MIN_TOTAL_RATINGS,
-        DEBUG_MODE
-    )
-except ImportError:
-    from feature_builder import (
-        calculate_weighted_similarity,
-        calculate_similarities_batch,
-        get_series_data
-    )
-    from config import (
-        RATING_LIKE,
-        RATING_DISLIKE,
-        ANCHOR_MULTIPLIER,
-        DISLIKE_EXCLUSION_THRESHOLD,
-        MIN_LIKES,
-        MIN_TOTAL_RATINGS,
-        DEBUG_MODE
-    )
+from src.logic_layer.feature_builder import (
+    calculate_similarities_batch,
+    calculate_similarity_matrix,
+    calculate_profile_scores,
+    top_n_indices,
+    get_series_data
+)
+from src.logic_layer.config import (
+    RATING_LIKE,
+    RATING_DISLIKE,
+    ANCHOR_MULTIPLIER,
+    DISLIKE_EXCLUSION_THRESHOLD,
+    MIN_LIKES,
+    MIN_TOTAL_RATINGS,
+    DEBUG_MODE
+)
 
 
 # =====================================
 # User Profile Building
 # =====================================
 
+def _rating_columns(user_ratings):
+    """
+    (ids, ratings, anchors) arrays from either rating form.
+    
+    user_ratings is a list of (tmdb_id, rating[, is_anchor]) tuples, or a
+    NumPy structured array with 'tmdb_id' and 'rating' fields (and an
+    optional 'is_anchor' field), whose columns are used as-is.
+    """
+    if isinstance(user_ratings, np.ndarray):
+        fields = user_ratings.dtype.names
+        anchors = (user_ratings['is_anchor'].astype(bool) if 'is_anchor' in fields
+                   else np.zeros(len(user_ratings), dtype=bool))
+        return user_ratings['tmdb_id'], user_ratings['rating'], anchors
+    
+    # One pass per column; (tmdb_id, rating) tuples default to is_anchor=False
+    count = len(user_ratings)
+    ids = np.fromiter((r[0] for r in user_ratings), dtype=np.int64, count=count)
+    ratings = np.fromiter((r[1] for r in user_ratings), dtype=np.float64, count=count)
+    anchors = np.fromiter((len(r) > 2 and bool(r[2]) for r in user_ratings), dtype=bool, count=count)
+    return ids, ratings, anchors
+
+
 def build_user_profile(user_ratings, weights=None):
     """
     Build a user profile from their ratings.
@@ -60,6 +64,7 @@ def build_user_profile(user_ratings, weights=None):
         user_ratings: List of tuples (tmdb_id, rating, is_anchor)
                      rating: 1 (like), -1 (dislike), 0 (neutral)
                      is_anchor: True if this is a key reference series
+                     (or a structured array with the same fields)
         weights: Custom feature weights (optional)
     
     Returns:
@@ -68,27 +73,13 @@ def build_user_profile(user_ratings, weights=None):
             - disliked_ids: List of disliked series IDs
             - anchor_ids: List of anchor series IDs
     """
-    liked_ids = []
-    disliked_ids = []
-    anchor_ids = []
-    
-    for rating_tuple in user_ratings:
-        # Handle both (tmdb_id, rating) and (tmdb_id, rating, is_anchor)
-        if len(rating_tuple) == 2:
-            tmdb_id, rating = rating_tuple
-            is_anchor = False
-        else:
-            tmdb_id, rating, is_anchor = rating_tuple
-        
-        if rating == RATING_LIKE:
-            liked_ids.append(tmdb_id)
-            if is_anchor:
-                anchor_ids.append(tmdb_id)
-                # Add anchor again to give it double weight
-                liked_ids.append(tmdb_id)
-        
-        elif rating == RATING_DISLIKE:
-            disliked_ids.append(tmdb_id)
+    ids, ratings, anchors = _rating_columns(user_ratings)
+    
+    liked = ratings == RATING_LIKE
+    anchor_ids = ids[liked & anchors].tolist()
+    # Anchors are added again to give them double weight
+    liked_ids = ids[liked].tolist() + anchor_ids
+    disliked_ids = ids[ratings == RATING_DISLIKE].tolist()
     
     if DEBUG_MODE:
         print(f"[PROFILE] Likes: {len(set(liked_ids))} (anchors: {len(anchor_ids)})")
@@ -106,17 +97,23 @@ def validate_user_ratings(user_ratings):
     Validate that user has provided sufficient ratings.
     
     Args:
-        user_ratings: List of rating tuples
+        user_ratings: List of rating tuples (or a structured ratings array)
     
     Returns:
         tuple: (is_valid, error_message)
     """
-    if not user_ratings:
+    if len(user_ratings) == 0:
         return False, "No ratings provided"
     
-    # Count likes and dislikes
-    likes = sum(1 for r in user_ratings if r[1] == RATING_LIKE)
-    dislikes = sum(1 for r in user_ratings if r[1] == RATING_DISLIKE)
+    if isinstance(user_ratings, np.ndarray):
+        ratings = user_ratings['rating']
+        likes = int(np.count_nonzero(ratings == RATING_LIKE))
+        dislikes = int(np.count_nonzero(ratings == RATING_DISLIKE))
+    else:
+        # Count likes and dislikes in one pass
+        rating_counts = Counter(r[1] for r in user_ratings)
+        likes = rating_counts[RATING_LIKE]
+        dislikes = rating_counts[RATING_DISLIKE]
     total = likes + dislikes
     
     if likes < MIN_LIKES:
@@ -150,18 +147,26 @@ def get_exclusion_list(disliked_ids, candidate_ids, threshold=None):
     if not disliked_ids:
         return set()
     
-    exclusion_set = set()
+    candidates = np.asarray(list(candidate_ids))
+    if not candidates.size:
+        return set()
     
-    for disliked_id in disliked_ids:
-        # Calculate similarity to all candidates
-        similarities = calculate_similarities_batch(disliked_id, candidate_ids)
-        
-        # Exclude any series too similar to this disliked series
-        for candidate_id, similarity in similarities:
-            if similarity >= threshold:
-                exclusion_set.add(candidate_id)
-                if DEBUG_MODE:
-                    print(f"[EXCLUSION] Excluding {candidate_id} (similar to disliked {disliked_id}: {similarity:.3f})")
+    # One (K, N) similarity matrix for all disliked series
+    refs = list(dict.fromkeys(disliked_ids))
+    # Pairs that cannot reach the threshold come back as -inf without full scoring
+    sim_matrix = calculate_similarity_matrix(refs, candidates.tolist(), min_score=threshold)
+    
+    # A disliked series is not compared with itself
+    for row, disliked_id in enumerate(refs):
+        sim_matrix[row, candidates == disliked_id] = -np.inf
+    
+    # Exclude any series too similar to at least one disliked series
+    too_similar = sim_matrix >= threshold
+    exclusion_set = set(candidates[too_similar.any(axis=0)].tolist())
+    
+    if DEBUG_MODE:
+        for row, col in np.argwhere(too_similar):
+            print(f"[EXCLUSION] Excluding {candidates[col]} (similar to disliked {refs[row]}: {sim_matrix[row, col]:.3f})")
     
     return exclusion_set
 
@@ -170,7 +175,7 @@ def get_exclusion_list(disliked_ids, candidate_ids, threshold=None):
 # Recommendation Calculation
 # =====================================
 
-def calculate_recommendation_scores(user_profile, candidate_ids, weights=None):
+def calculate_recommendation_scores(user_profile, candidate_ids, weights=None, top_n=None, exclude=None):
     """
     Calculate recommendation scores for candidates based on user profile.
     
@@ -179,10 +184,17 @@ def calculate_recommendation_scores(user_profile, candidate_ids, weights=None):
     2. Anchors are included twice in the average (giving them more weight)
     3. Sort by score descending
     
+    The anchor-weighted sum over the K distinct liked series is computed by
+    calculate_profile_scores(): genre/keyword and popularity similarity per
+    pair, the other features from per-profile lookup tables (similarity is
+    not an inner product, so liked series are not averaged into one vector).
+    
     Args:
         user_profile: User profile dict from build_user_profile()
         candidate_ids: List of candidate series IDs
         weights: Custom feature weights (optional)
+        top_n: Keep only the top N scores (optional)
+        exclude: Set of series IDs to skip, e.g. the dislike exclusion list (optional)
     
     Returns:
         list: List of tuples (tmdb_id, score) sorted by score descending
@@ -192,27 +204,22 @@ def calculate_recommendation_scores(user_profile, candidate_ids, weights=None):
     if not liked_ids:
         return []
     
-    scores = []
+    # Skip liked and excluded candidates in a single vectorized pass (order is kept)
+    skip = frozenset(liked_ids).union(exclude or ())
+    candidates = np.fromiter(candidate_ids, dtype=np.int64)
+    candidates = candidates[~np.isin(candidates, np.fromiter(skip, dtype=np.int64, count=len(skip)))].tolist()
+    if not candidates:
+        return []
     
-    for candidate_id in candidate_ids:
-        # Skip if candidate is in the liked list
-        if candidate_id in liked_ids:
-            continue
-        
-        # Calculate similarity to each liked series (including anchor duplicates)
-        similarities = []
-        for liked_id in liked_ids:
-            sim = calculate_weighted_similarity(candidate_id, liked_id, weights)
-            similarities.append(sim)
-        
-        # Average similarity
-        avg_score = sum(similarities) / len(similarities)
-        scores.append((candidate_id, avg_score))
+    # Each distinct liked series counts as many times as it appears (anchors twice)
+    multiplicity = Counter(liked_ids)
+    reference_ids = list(multiplicity)
+    counts = np.array([multiplicity[rid] for rid in reference_ids], dtype=np.float64)
     
-    # Sort by score descending
-    scores.sort(key=lambda x: x[1], reverse=True)
+    avg_scores = calculate_profile_scores(reference_ids, counts, candidates, weights) / len(liked_ids)
     
-    return scores
+    # Sort by score descending (an O(N) partition when only the top N are needed)
+    return [(candidates[i], avg_scores[i].item()) for i in top_n_indices(avg_scores, top_n)]
 
 
 def get_recommendations(user_ratings, candidate_ids, filters=None, top_n=10, weights=None):
@@ -220,7 +227,8 @@ def get_recommendations(user_ratings, candidate_ids, filters=None, top_n=10, wei
     Main recommendation function.
     
     Args:
-        user_ratings: List of (tmdb_id, rating, is_anchor?) tuples
+        user_ratings: List of (tmdb_id, rating, is_anchor?) tuples,
+                      or a structured array with those fields
         candidate_ids: List of pre-filtered candidate series IDs
         filters: Filter dict (for logging/debugging)
         top_n: Number of recommendations to return
@@ -239,26 +247,21 @@ def get_recommendations(user_ratings, candidate_ids, filters=None, top_n=10, wei
     # Build user profile
     user_profile = build_user_profile(user_ratings, weights)
     
-    # Apply dislike exclusion
-    exclusion_list = get_exclusion_list(
-        user_profile['disliked_ids'],
-        candidate_ids
-    )
-    
-    # Remove excluded series from candidates
-    filtered_candidates = [
-        cid for cid in candidate_ids 
-        if cid not in exclusion_list
-    ]
-    
-    if DEBUG_MODE:
-        print(f"[FILTER] Candidates: {len(candidate_ids)} → {len(filtered_candidates)} (excluded {len(exclusion_list)})")
-    
-    # Calculate scores
-    scores = calculate_recommendation_scores(user_profile, filtered_candidates, weights)
+    # Apply dislike exclusion (nothing to score or filter without dislikes)
+    exclusion_list = None
+    if user_profile['disliked_ids']:
+        exclusion_list = get_exclusion_list(
+            user_profile['disliked_ids'],
+            candidate_ids
+        )
+        
+        if DEBUG_MODE:
+            print(f"[FILTER] Candidates: {len(candidate_ids)} → {len(candidate_ids) - len(exclusion_list)} (excluded {len(exclusion_list)})")
     
-    # Return top N
-    return scores[:top_n]
+    # Calculate the top N scores (excluded and liked series are skipped in the same pass)
+    return calculate_recommendation_scores(
+        user_profile, candidate_ids, weights, top_n=top_n, exclude=exclusion_list
+    )
 
 
 # =====================================
@@ -270,6 +273,9 @@ def build_similarity_matrix(series_ids, weights=None):
     Build a full similarity matrix for a list of series.
     Useful for analysis and debugging.
     
+    All pairs are scored in one calculate_similarity_matrix() call; the
+    upper triangle is mirrored so the result is exactly symmetric.
+    
     Args:
         series_ids: List of series IDs
         weights: Custom feature weights (optional)
@@ -277,26 +283,20 @@ def build_similarity_matrix(series_ids, weights=None):
     Returns:
         dict: Nested dict {id_a: {id_b: similarity}}
     """
-    matrix = {}
+    ids = list(series_ids)
+    if not ids:
+        return {}
     
-    for i, id_a in enumerate(series_ids):
-        matrix[id_a] = {}
-        
-        for id_b in series_ids:
-            if id_a == id_b:
-                matrix[id_a][id_b] = 1.0  # Perfect self-similarity
-            elif id_b in matrix and id_a in matrix[id_b]:
-                # Use already calculated value (symmetric)
-                matrix[id_a][id_b] = matrix[id_b][id_a]
-            else:
-                # Calculate new similarity
-                sim = calculate_weighted_similarity(id_a, id_b, weights)
-                matrix[id_a][id_b] = sim
-        
-        if DEBUG_MODE and (i + 1) % 10 == 0:
-            print(f"[MATRIX] Processed {i + 1}/{len(series_ids)} series")
+    sims = calculate_similarity_matrix(ids, ids, weights)
     
-    return matrix
+    lower = np.tril_indices(len(ids), -1)
+    sims[lower] = sims.T[lower]
+    np.fill_diagonal(sims, 1.0)  # Perfect self-similarity
+    
+    if DEBUG_MODE:
+        print(f"[MATRIX] Processed {len(ids)}/{len(ids)} series")
+    
+    return {id_a: dict(zip(ids, row)) for id_a, row in zip(ids, sims.tolist())}
 
 
 # =====================================
@@ -317,7 +317,5 @@ def find_most_similar(tmdb_id, candidate_ids, top_n=10, weights=None):
     Returns:
         list: List of tuples (candidate_id, similarity_score)
     """
-    similarities = calculate_similarities_batch(tmdb_id, candidate_ids, weights)
-    similarities.sort(key=lambda x: x[1], reverse=True)
-    
-    return similarities[:top_n]
+    # Sorted top N; candidates that cannot make the top N are pruned early
+    return calculate_similarities_batch(tmdb_id, candidate_ids, weights, top_n=top_n)
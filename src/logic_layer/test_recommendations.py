@@ -5,16 +5,10 @@ Simple script for manual testing of the recommendation engine.
 No benchmarking, just quick results to verify everything works.
 """
 
-import sys
-import os
+from unittest import mock
 
-# Add parent directories to path
-current_dir = os.path.dirname(os.path.abspath(__file__))
-parent_dir = os.path.dirname(current_dir)
-sys.path.insert(0, parent_dir)
-sys.path.insert(0, current_dir)
-
-from recommender import get_recommendations, search_series, get_popular_series
+from src.logic_layer.filters import apply_filters
+from src.logic_layer.recommender import get_recommendations, search_series, get_popular_series
 
 
 # =====================================
@@ -204,6 +198,30 @@ def test_minimal_filters():
     return recommendations
 
 
+def test_status_only_filter():
+    """
+    Test: apply_filters with only 'status' set (no database needed).
+    Expected: one query filtering on status alone, with the statuses as params.
+    """
+    print("\n" + "="*60)
+    print("TEST 5: Status-Only Filter")
+    print("="*60)
+    
+    with mock.patch('src.logic_layer.filters.fetch_query', return_value=[(1396,), (1399,)]) as fetch:
+        candidate_ids = apply_filters({'status': ['Running', 'Ended']})
+    
+    fetch.assert_called_once()
+    query, params = fetch.call_args.args
+    assert "WHERE s.status IN (%s,%s)" in query
+    assert "original_language" not in query and "series_genres" not in query
+    assert params == ('Running', 'Ended')
+    assert candidate_ids == [1396, 1399]
+    
+    print("  ✅ status-only filter builds a single status query")
+    
+    return candidate_ids
+
+
 # =====================================
 # Helper Functions
 # =====================================
@@ -312,10 +330,11 @@ if __name__ == "__main__":
     print("  2. Diverse Taste")
     print("  3. Anime Fan")
     print("  4. Minimal Filters")
-    print("  5. Interactive Test")
-    print("  6. Run All Tests")
+    print("  5. Status-Only Filter")
+    print("  6. Interactive Test")
+    print("  7. Run All Tests")
     
-    choice = input("\nChoice (1-6): ").strip()
+    choice = input("\nChoice (1-7): ").strip()
     
     if choice == "1":
         test_crime_drama_fan()
@@ -326,12 +345,15 @@ if __name__ == "__main__":
     elif choice == "4":
         test_minimal_filters()
     elif choice == "5":
-        interactive_test()
+        test_status_only_filter()
     elif choice == "6":
+        interactive_test()
+    elif choice == "7":
         test_crime_drama_fan()
         test_diverse_taste()
         test_anime_fan()
         test_minimal_filters()
+        test_status_only_filter()
     else:
         print("\nRunning default test (Crime Drama Fan)...")
         test_crime_drama_fan()
@@ -3,21 +3,266 @@ Series Architect - Flask Application
 Main server file - Unified Screen with Sidebar
 """
 
-from flask import Flask, render_template, request, session, jsonify
-import sys
-from pathlib import Path
+import decimal
+import hashlib
+import logging
+import os
+import threading
+import time
+from itertools import chain
 
-# Add all necessary paths
-current_dir = Path(__file__).parent
-project_root = current_dir.parent.parent
-sys.path.insert(0, str(project_root / 'src'))
-sys.path.insert(0, str(project_root / 'src' / 'logic_layer'))
-sys.path.insert(0, str(project_root / 'src' / 'data_layer'))
+import numpy as np
+import orjson
+from flask import Flask, Response, render_template, request, session, jsonify
+from flask.json.provider import JSONProvider
+
+import src.data_layer.db_utils as db_utils_module
+import src.logic_layer.filters as filters_module
+import src.logic_layer.recommender as recommender_module
+from src.logic_layer.config import GENRE_CATEGORIES, RATING_LIKE, RATING_DISLIKE, RATING_NEUTRAL
+from src.logic_layer.feature_builder import init_kernel_threads, warm_up_kernels
+
+logger = logging.getLogger(__name__)
+
+
+# =====================================
+# JSON (orjson)
+# =====================================
+
+def _orjson_default(obj):
+    """Types orjson can't serialize natively (same conversion as Flask's default)."""
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    if hasattr(obj, '__html__'):
+        return str(obj.__html__())
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class OrjsonProvider(JSONProvider):
+    """
+    orjson-backed JSON for jsonify(), request.json and the tojson filter.
+    NumPy scalars/arrays and non-string keys (e.g. int decades) are allowed.
+    """
+    option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=_orjson_default, option=self.option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Write orjson's bytes straight into the response (no str round-trip)
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=_orjson_default, option=self.option)
+        return self._app.response_class(body, mimetype='application/json')
+
+
+# Genre category names shown in the sidebar (fixed, so built once)
+GENRE_NAMES = list(GENRE_CATEGORIES.keys())
+
+# Genre IDs of each category as a tuple (categories may map to one ID or a list)
+GENRE_IDS_BY_CATEGORY = {
+    name: tuple(ids) if isinstance(ids, list) else (ids,)
+    for name, ids in GENRE_CATEGORIES.items()
+}
 
-from logic_layer.config import GENRE_CATEGORIES
 
 app = Flask(__name__)
 app.secret_key = 'series_architect_secret_key_2026'  # Change in production
+app.json = OrjsonProvider(app)
+
+# Server-side sessions (optional): with SESSION_REDIS_URL set, the cookie only
+# carries a session ID and the session data (ratings) lives in Redis, instead
+# of being serialized and signed into the cookie on every response.
+SESSION_REDIS_URL = os.getenv('SESSION_REDIS_URL')
+if SESSION_REDIS_URL:
+    import redis
+    from flask_session import Session
+
+    app.config.update(SESSION_TYPE='redis', SESSION_REDIS=redis.from_url(SESSION_REDIS_URL))
+    Session(app)
+
+
+# =====================================
+# Session Ratings
+# =====================================
+# Ratings live in the signed session cookie as one packed array (5 bytes per
+# rating) instead of a JSON object with string keys.
+_RATINGS_DTYPE = np.dtype([('tmdb_id', '<i4'), ('rating', '<i1')])
+_RATING_VALUES = (RATING_LIKE, RATING_DISLIKE, RATING_NEUTRAL)
+
+
+def _pack_ratings(ratings):
+    """
+    {tmdb_id: rating} from the client -> bytes.
+    Raises ValueError for a non-numeric tmdb_id or a rating other than like/dislike/neutral.
+    """
+    if not isinstance(ratings, dict):
+        raise ValueError("ratings must be an object of {tmdb_id: rating}")
+    
+    packed = []
+    for tmdb_id, rating in ratings.items():
+        try:
+            series_id = int(tmdb_id)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid tmdb_id: {tmdb_id!r}") from None
+        if not 0 < series_id <= np.iinfo(np.int32).max:
+            raise ValueError(f"Invalid tmdb_id: {tmdb_id!r}")
+        if isinstance(rating, bool) or rating not in _RATING_VALUES:
+            raise ValueError(f"Invalid rating for {tmdb_id}: {rating!r}")
+        packed.append((series_id, rating))
+    
+    return np.array(packed, dtype=_RATINGS_DTYPE).tobytes()
+
+
+def _unpack_ratings(blob):
+    """Bytes from _pack_ratings() -> structured array with tmdb_id / rating columns"""
+    return np.frombuffer(blob, dtype=_RATINGS_DTYPE)
+
+
+def _session_ratings():
+    """
+    Ratings array stored in the session. A session written before the packed
+    form still has a 'ratings' dict: it is converted (once) and replaced.
+    """
+    blob = session.get('ratings_blob')
+    if blob is None and 'ratings' in session:
+        legacy = session.pop('ratings')
+        try:
+            blob = session['ratings_blob'] = _pack_ratings(legacy)
+        except ValueError as e:
+            logger.warning("Dropping invalid legacy session ratings: %s", e)
+    return _unpack_ratings(blob or b'')
+
+
+# =====================================
+# Page Cache
+# =====================================
+# The pages are static for the app's lifetime, so each is rendered once
+# (per URL prefix, which url_for() bakes into the static links) and served
+# as bytes with an ETag. Skipped while templates auto-reload (debug mode).
+_page_cache = {}
+
+
+def _cached_page(template, **context):
+    """Rendered template as a cached, conditional (ETag / 304) HTML response."""
+    if app.jinja_env.auto_reload:
+        return render_template(template, **context)
+    
+    key = (template, request.script_root)
+    page = _page_cache.get(key)
+    if page is None:
+        html = render_template(template, **context).encode()
+        page = _page_cache[key] = (html, hashlib.sha1(html).hexdigest())
+    
+    html, etag = page
+    response = Response(html, mimetype='text/html')
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+
+# =====================================
+# Series List Cache
+# =====================================
+# Users keep toggling the same few filter combinations, so each combination's
+# series cards (JSON text) are kept and apply_filters() + the series query run
+# once for it. Entries expire after SERIES_CACHE_TTL seconds, so catalog
+# refreshes (run by the ETL in another process) show up without a restart.
+# Insertion-ordered, oldest evicted first. Empty results (also what a failed
+# query returns) are not cached.
+SERIES_CACHE_SIZE = 512
+SERIES_CACHE_TTL = 300
+_series_cache = {}
+
+# Guards the response caches below (requests run on several threads)
+_response_cache_lock = threading.Lock()
+
+# Filters matching more series than this pass the IDs through a temp table
+SERIES_ID_TABLE_THRESHOLD = 700
+
+
+def _filter_key(filters_dict):
+    """Canonical, hashable form of a filters dict (value order and duplicates don't matter)."""
+    return tuple(
+        (name, tuple(sorted(set(values), key=str)))
+        for name, values in sorted(filters_dict.items())
+    )
+
+
+def _cache_get(cache, key):
+    """Unexpired value cached under `key`, or None."""
+    entry = cache.get(key)
+    if entry is not None and time.monotonic() < entry[0]:
+        return entry[1]
+    return None
+
+
+def _cache_put(cache, key, value, size, ttl):
+    """Cache `value` for `ttl` seconds, evicting the oldest entry beyond `size`."""
+    with _response_cache_lock:
+        cache.pop(key, None)
+        if len(cache) >= size:
+            cache.pop(next(iter(cache)))
+        cache[key] = (time.monotonic() + ttl, value)
+
+
+def _cache_series(key, cards_json):
+    """Remember the (non-empty) series cards JSON for a filter key."""
+    if cards_json:
+        _cache_put(_series_cache, key, cards_json, SERIES_CACHE_SIZE, SERIES_CACHE_TTL)
+
+
+# Rating-screen cards as one JSON array, most popular first, serialized by
+# Postgres (::text keeps psycopg2 from parsing it back into Python objects).
+# {source} selects the series (an ID-array WHERE or a JOIN).
+_SERIES_CARDS_QUERY = """
+    SELECT json_agg(json_build_object(
+               'tmdb_id', s.tmdb_id,
+               'title', COALESCE(NULLIF(s.title_en, ''), 'No Title'),
+               'poster', 'https://image.tmdb.org/t/p/w500' || NULLIF(s.poster_path, ''),
+               'language', s.original_language
+           ) ORDER BY s.popularity DESC)::text
+    FROM series s
+    {source}
+"""
+
+
+def _series_response(cards_json):
+    """{"series": [...]} response around an already-serialized JSON array of cards."""
+    return Response('{"series":' + cards_json + '}', mimetype='application/json')
+
+
+# =====================================
+# Recommendations Cache
+# =====================================
+# The same ratings (a user re-requesting, or two users agreeing) always give
+# the same recommendations, so the serialized response body is kept per
+# (ratings hash, top_n). Entries expire after RECOMMENDATIONS_CACHE_TTL
+# seconds so catalog syncs and series_features refreshes are picked up.
+# Insertion-ordered, oldest evicted first; empty results are not cached.
+RECOMMENDATIONS_CACHE_SIZE = 1024
+RECOMMENDATIONS_CACHE_TTL = 300
+_recommendations_cache = {}
+
+
+def _ratings_key(ratings):
+    """Order-independent hash of a ratings array"""
+    canonical = np.sort(ratings, order=('tmdb_id', 'rating')).tobytes()
+    return hashlib.blake2b(canonical, digest_size=16).hexdigest()
+
+
+def _cache_recommendations(key, body):
+    """Remember the response body for a (ratings hash, top_n) key."""
+    _cache_put(_recommendations_cache, key, body, RECOMMENDATIONS_CACHE_SIZE, RECOMMENDATIONS_CACHE_TTL)
+
+# Configure the compiled kernels' threads, then load them at startup
+# instead of on the first recommendation
+init_kernel_threads()
+warm_up_kernels()
+# Open the pooled DB connections now so requests never connect on the hot path
+db_utils_module.warm_up_pool()
+
 
 # =====================================
 # Routes
@@ -26,14 +271,11 @@ app.secret_key = 'series_architect_secret_key_2026'  # Change in production
 @app.route('/')
 def index():
     """Main screen with sidebar filters and series rating"""
-    return render_template('index.html', genres=list(GENRE_CATEGORIES.keys()))
+    return _cached_page('index.html', genres=GENRE_NAMES)
 
 @app.route('/api/get-series', methods=['POST'])
 def get_series():
     """Get filtered series for rating"""
-    import logic_layer.filters as filters_module
-    import data_layer.db_utils as db_utils_module
-
     data = request.json
 
     # Build filters dict
@@ -45,59 +287,51 @@ def get_series():
 
     # Genres - convert to genre IDs
     if data.get('genres') and len(data['genres']) > 0:
-        # Convert genre names to IDs using GENRE_CATEGORIES
-        genre_ids = []
-        for genre_name in data['genres']:
-            if genre_name in GENRE_CATEGORIES:
-                # GENRE_CATEGORIES[name] returns a list, so extend instead of append
-                category_ids = GENRE_CATEGORIES[genre_name]
-                if isinstance(category_ids, list):
-                    genre_ids.extend(category_ids)
-                else:
-                    genre_ids.append(category_ids)
+        # Convert genre names to IDs (GENRE_IDS_BY_CATEGORY is flattened once at import)
+        genre_ids = list(chain.from_iterable(
+            GENRE_IDS_BY_CATEGORY[name] for name in data['genres'] if name in GENRE_IDS_BY_CATEGORY
+        ))
         if genre_ids:
             filters_dict['genres'] = genre_ids
 
-        print(f"[DEBUG] Genre names: {data['genres']}")
-        print(f"[DEBUG] Genre IDs: {genre_ids}")
+        logger.debug("Genre names: %s", data['genres'])
+        logger.debug("Genre IDs: %s", genre_ids)
 
     # Decades
     if data.get('decades') and len(data['decades']) > 0:
         filters_dict['decades'] = data['decades']
 
+    # Same filter combination as an earlier request - reuse its series list
+    cache_key = _filter_key(filters_dict)
+    cached = _cache_get(_series_cache, cache_key)
+    if cached is not None:
+        return _series_response(cached)
+
     # Get series IDs matching filters
     try:
         series_ids = filters_module.apply_filters(filters_dict)
 
         if not series_ids:
-            return jsonify({'series': []})
-
-        # Fetch series details
-        placeholders = ','.join(['%s'] * len(series_ids))
-        query = f"""
-            SELECT tmdb_id, title_en, poster_path, original_language
-            FROM series
-            WHERE tmdb_id IN ({placeholders})
-            ORDER BY popularity DESC
-        """
-
-        rows = db_utils_module.fetch_query(query, tuple(series_ids))
-
-        series_list = []
-        for row in rows:
-            series_list.append({
-                'tmdb_id': row[0],
-                'title': row[1] or 'No Title',
-                'poster': f"https://image.tmdb.org/t/p/w500{row[2]}" if row[2] else None,
-                'language': row[3]
-            })
-
-        return jsonify({'series': series_list})
+            return _series_response('[]')
+
+        # Fetch the series cards as one JSON array built by Postgres
+        # (all IDs as one array parameter, or a temp table for long lists)
+        if len(series_ids) <= SERIES_ID_TABLE_THRESHOLD:
+            # Prepared once per pooled connection, then only EXECUTEd with the ID array
+            # (apply_filters() returns a list, which psycopg2 adapts to an array as is)
+            query = _SERIES_CARDS_QUERY.format(source="WHERE s.tmdb_id = ANY($1)")
+            rows = db_utils_module.fetch_prepared('series_cards_by_ids', query, (series_ids,))
+        else:
+            # Very long ID lists are loaded into a temp table and joined
+            query = _SERIES_CARDS_QUERY.format(source="JOIN _tmp_ids t USING (tmdb_id)")
+            rows = db_utils_module.fetch_with_id_table(query, series_ids)
+
+        cards_json = rows[0][0] if rows else None
+        _cache_series(cache_key, cards_json)
+        return _series_response(cards_json or '[]')
 
     except Exception as e:
-        print(f"Error fetching series: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error fetching series: %s", e)
         return jsonify({'series': [], 'error': str(e)}), 500
 
 @app.route('/api/save-ratings', methods=['POST'])
@@ -105,52 +339,58 @@ def save_ratings():
     """Save user ratings to session"""
     data = request.json
     ratings = data.get('ratings', {})
-    print(f"[DEBUG] Saving ratings to session: {ratings}")
-    session['ratings'] = ratings
-    print(f"[DEBUG] Session after save: {session.get('ratings', {})}")
+    logger.debug("Saving ratings to session: %s", ratings)
+    try:
+        session['ratings_blob'] = _pack_ratings(ratings)
+    except ValueError as e:
+        logger.warning("Rejected ratings: %s", e)
+        return jsonify({'success': False, 'error': str(e)}), 400
     return jsonify({'success': True})
 
 @app.route('/screen-3')
 def screen_3():
     """Screen 3: Recommendations"""
-    return render_template('recommendations.html')
+    return _cached_page('recommendations.html')
 
 @app.route('/api/get-recommendations', methods=['POST'])
 def get_recommendations():
     """Get personalized recommendations based on user ratings"""
-    import logic_layer.recommender as recommender_module
-    import data_layer.db_utils as db_utils_module
+    # Session keys only (listing values would deserialize and copy all of them)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Session keys: %s", list(session.keys()))
 
     # Get ratings from session (saved by save-ratings endpoint)
-    print(f"[DEBUG] Full session: {dict(session)}")
-    ratings = session.get('ratings', {})
-    print(f"[DEBUG] Ratings from session: {ratings}")
+    ratings = _session_ratings()
+    logger.debug("Ratings from session: %s", ratings)
 
-    if not ratings:
+    if ratings.size == 0:
         return jsonify({'recommendations': [], 'error': 'No ratings found in session'}), 400
 
-    # Convert ratings dict to list of tuples (tmdb_id, rating, is_anchor)
-    user_ratings = []
-    for tmdb_id_str, rating in ratings.items():
-        tmdb_id = int(tmdb_id_str)
-        # For now, no anchors - can be added later
-        user_ratings.append((tmdb_id, rating, False))
+    top_n = 14
+    cache_key = (_ratings_key(ratings), top_n)
+    body = _cache_get(_recommendations_cache, cache_key)
+    if body is not None:
+        return Response(body, mimetype='application/json')
 
     try:
-        # Get 14 recommendations
+        # Get 14 recommendations (the ratings array's columns are used directly;
+        # no is_anchor field, so no anchors for now - can be added later)
         recommendations = recommender_module.get_recommendations(
-            user_ratings=user_ratings,
+            user_ratings=ratings,
             filters=None,  # No filters for recommendations
-            top_n=14
+            top_n=top_n
         )
 
-        return jsonify({'recommendations': recommendations})
+        response = jsonify({'recommendations': recommendations})
+        if recommendations:
+            _cache_recommendations(cache_key, response.get_data())
+        return response
 
     except Exception as e:
-        print(f"Error getting recommendations: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error getting recommendations: %s", e)
         return jsonify({'recommendations': [], 'error': str(e)}), 500
 
 if __name__ == '__main__':
+    # Request debug logging is off at INFO (set DEBUG to trace filters/ratings)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     app.run(debug=True, port=5000)
\ No newline at end of file